@@ -1,15 +1,17 @@
 import sys
 import os
 import time
-import threading
 import ctypes
 import logging
-from typing import List, Tuple, Optional
-from datetime import datetime
+from typing import Dict, List, Tuple, Optional
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QLineEdit, QPushButton, QListWidget, QTabWidget, 
-                            QListWidgetItem, QMessageBox, QFormLayout, QFrame)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject
+                            QMessageBox, QFormLayout,
+                            QDialog, QCheckBox, QSpinBox, QFileDialog, QListView,
+                            QAbstractItemView)
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject, QAbstractListModel, QModelIndex
+from blocker_core import (BlockerException, BlockingManager, Configuration, HostsBackup, HostsFileManager)
+import blocker_daemon
 
 # Configure logging
 logging.basicConfig(
@@ -21,139 +23,161 @@ logging.basicConfig(
     ]
 )
 
-class BlockerException(Exception):
-    """Custom exception for website blocker specific errors"""
-    pass
+class DaemonConnection(QObject):
+    """Connects the GUI to the blocker daemon
 
-class HostsFileManager:
-    """Manages operations on the hosts file"""
-    def __init__(self):
-        self.hosts_path = "/etc/hosts" if os.name != 'nt' else r"C:\Windows\System32\drivers\etc\hosts"
-        self.redirect = "127.0.0.1"
-        self._lock = threading.Lock()
-
-    def validate_website(self, website: str) -> bool:
-        """Validate website format"""
-        website = website.strip()
-        if not website:
-            return False
-        # Basic domain validation
-        return all(char in '.-_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789' for char in website)
-
-    def add_websites(self, websites: List[str]) -> None:
-        """Add websites to hosts file"""
-        try:
-            with self._lock:
-                with open(self.hosts_path, "a") as file:
-                    for website in websites:
-                        if self.validate_website(website):
-                            entry = f"{self.redirect} {website.strip()}\n"
-                            file.write(entry)
-                            logging.info(f"Added website to hosts file: {website}")
-                        else:
-                            raise BlockerException(f"Invalid website format: {website}")
-        except PermissionError:
-            logging.error("Permission denied while accessing hosts file")
-            raise BlockerException("Permission denied. Please run as administrator.")
-        except IOError as e:
-            logging.error(f"IO Error while accessing hosts file: {e}")
-            raise BlockerException(f"Error accessing hosts file: {e}")
-
-    def remove_websites(self, websites: List[str]) -> None:
-        """Remove websites from hosts file"""
-        try:
-            with self._lock:
-                with open(self.hosts_path, "r") as file:
-                    lines = file.readlines()
-                
-                with open(self.hosts_path, "w") as file:
-                    for line in lines:
-                        if not any(website in line for website in websites):
-                            file.write(line)
-                logging.info(f"Removed websites from hosts file: {websites}")
-        except Exception as e:
-            logging.error(f"Error removing websites from hosts file: {e}")
-            raise BlockerException(f"Error removing websites: {e}")
-
-class BlockingManager(QObject):
-    """Manages the blocking/unblocking of websites"""
-    website_blocked = pyqtSignal(str, int)
-    website_unblocked = pyqtSignal(str)
+    Mirrors the daemon's active blocks from its events, which arrive on a
+    background thread and are handed to the GUI thread through a queued signal.
+    """
+    websites_blocked = pyqtSignal(list, int)
+    websites_unblocked = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
+    _event_received = pyqtSignal(str, dict)
 
-    def __init__(self):
-        super().__init__()
-        self.hosts_manager = HostsFileManager()
-        self.active_blocks: List[Tuple[str, int, threading.Timer]] = []
-        self._lock = threading.Lock()
+    def __init__(self, service, parent=None):
+        super().__init__(parent)
+        self.service = service  # BlockerClient, or a BlockingManager where there is no daemon
+        self._event_received.connect(self._handle_event)
+        self.unsubscribe = service.subscribe(lambda event, data: self._event_received.emit(event, data))
+        self.active_blocks: Dict[str, float] = service.list_blocks()
+
+    def _handle_event(self, event: str, data: dict):
+        if event == "blocked":
+            self.active_blocks.update(dict.fromkeys(data["websites"], data["expires_at"]))
+            self.websites_blocked.emit(data["websites"], data["duration"])
+        elif event == "unblocked":
+            for website in data["websites"]:
+                self.active_blocks.pop(website, None)
+            self.websites_unblocked.emit(data["websites"])
+        elif event == "error":
+            self.error_occurred.emit(data["message"])
 
     def block_websites(self, websites: List[str], duration: int) -> None:
         """Block websites for specified duration"""
         try:
-            cleaned_websites = [w.strip() for w in websites if self.hosts_manager.validate_website(w.strip())]
-            if not cleaned_websites:
-                raise BlockerException("No valid websites provided")
-
-            with self._lock:
-                self.hosts_manager.add_websites(cleaned_websites)
-                
-                for website in cleaned_websites:
-                    # Cancel existing timer if website is already blocked
-                    self.cancel_existing_block(website)
-                    
-                    # Create new timer
-                    timer = threading.Timer(duration, self.unblock_websites, args=([website],))
-                    timer.daemon = True
-                    timer.start()
-                    
-                    self.active_blocks.append((website, duration, timer))
-                    self.website_blocked.emit(website, duration)
-                    logging.info(f"Blocked website: {website} for {duration} seconds")
-                    
+            self.service.block(websites, duration)
         except BlockerException as e:
-            logging.error(f"Error in block_websites: {e}")
             self.error_occurred.emit(str(e))
-        except Exception as e:
-            logging.error(f"Unexpected error in block_websites: {e}")
-            self.error_occurred.emit(f"Unexpected error: {e}")
 
     def unblock_websites(self, websites: List[str]) -> None:
         """Unblock specified websites"""
         try:
-            with self._lock:
-                self.hosts_manager.remove_websites(websites)
-                
-                # Remove from active blocks and cancel timers
-                new_active_blocks = []
-                for website, duration, timer in self.active_blocks:
-                    if website not in websites:
-                        new_active_blocks.append((website, duration, timer))
-                    else:
-                        timer.cancel()
-                        self.website_unblocked.emit(website)
-                        logging.info(f"Unblocked website: {website}")
-                
-                self.active_blocks = new_active_blocks
-                
-        except Exception as e:
-            logging.error(f"Error in unblock_websites: {e}")
+            self.service.unblock(websites)
+        except BlockerException as e:
             self.error_occurred.emit(f"Error unblocking websites: {e}")
 
-    def cancel_existing_block(self, website: str) -> None:
-        """Cancel existing block for a website"""
-        for _, _, timer in self.active_blocks:
-            if website in timer.args[0]:
-                timer.cancel()
+    def import_blocklist(self, path: str, duration: int, expand_variants: bool = False) -> int:
+        """Block every website of a blocklist file as one batch; returns the number of websites"""
+        try:
+            return len(self.service.import_blocklist(path, duration, expand_variants)["blocked"])
+        except BlockerException as e:
+            self.error_occurred.emit(str(e))
+            return 0
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        self.service.flush(timeout)
+
+    def remaining_seconds(self, website: str) -> int:
+        """Seconds until the website's block expires"""
+        return max(int(self.active_blocks.get(website, 0) - time.time()), 0)
+
+class ActiveBlocksModel(QAbstractListModel):
+    """List model of the active blocks and their remaining time
+
+    Rows are inserted and removed incrementally, one batch per block or
+    unblock operation, so views only lay out what changed.
+    """
+
+    def __init__(self, blocking_manager: DaemonConnection, parent=None):
+        super().__init__(parent)
+        self.blocking_manager = blocking_manager
+        self._websites: List[str] = list(blocking_manager.active_blocks)
+        self._rows: Dict[str, int] = {website: row for row, website in enumerate(self._websites)}
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._websites)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._websites):
+            return None
+        website = self._websites[index.row()]
+        if role == Qt.DisplayRole:
+            remaining = self.blocking_manager.remaining_seconds(website)
+            return f"{website} - {remaining//60}:{remaining%60:02d} remaining"
+        if role == Qt.UserRole:
+            return website
+        return None
+
+    def add_websites(self, websites: List[str]) -> None:
+        """Append rows for websites not listed yet; listed ones get their new remaining time"""
+        new_websites = [website for website in dict.fromkeys(websites) if website not in self._rows]
+        if new_websites:
+            first = len(self._websites)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_websites) - 1)
+            for website in new_websites:
+                self._rows[website] = len(self._websites)
+                self._websites.append(website)
+            self.endInsertRows()
+        if len(new_websites) < len(websites):
+            self.refresh_rows(0, len(self._websites) - 1)
+
+    def remove_websites(self, websites: List[str]) -> None:
+        """Remove the rows of the websites, one contiguous range at a time"""
+        rows = sorted({self._rows[website] for website in websites if website in self._rows})
+        if not rows:
+            return
+        if len(rows) > 64 and len(rows) > len(self._websites) // 4:
+            # Large removals are cheaper as one reset than as many ranges
+            self.beginResetModel()
+            removed = set(websites)
+            self._websites = [website for website in self._websites if website not in removed]
+            self._rows = {website: row for row, website in enumerate(self._websites)}
+            self.endResetModel()
+            return
+        # Remove from the back so that the remaining row numbers stay valid
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._websites[first:last + 1]
+            self.endRemoveRows()
+        for website in websites:
+            self._rows.pop(website, None)
+        for row in range(rows[0], len(self._websites)):
+            self._rows[self._websites[row]] = row
+
+    def website(self, row: int) -> str:
+        return self._websites[row]
+
+    def refresh_rows(self, first: int, last: int) -> None:
+        """Have views repaint the remaining time of the given rows"""
+        if 0 <= first <= last < len(self._websites):
+            self.dataChanged.emit(self.index(first), self.index(last), [Qt.DisplayRole])
 
 class BlockerApp(QWidget):
     """Main application window"""
     def __init__(self):
         super().__init__()
-        self.blocking_manager = BlockingManager()
+        self.config = Configuration()
+        # The GUI is a client of the blocker daemon, which is started in this process if it is not running
+        self.blocking_manager = DaemonConnection(
+            blocker_daemon.connect(self.config.current_config.get("socket_path", blocker_daemon.DEFAULT_SOCKET_PATH),
+                                   self.create_blocking_manager), self)
         self.history_manager = set()
         self.setup_ui()
         self.setup_connections()
 
+    def create_blocking_manager(self) -> BlockingManager:
+        """Create the blocking manager served by an in-process daemon"""
+        hosts_manager = HostsFileManager()
+        backup = (HostsBackup(hosts_manager.hosts_path)
+                  if self.config.current_config.get("backup_hosts", True) else None)
+        return BlockingManager(hosts_manager, backup=backup)
+
     def setup_ui(self):
         """Initialize the user interface"""
         self.setWindowTitle("Website Blocker")
@@ -224,16 +248,27 @@ class BlockerApp(QWidget):
         
         # Block button
         self.block_button = QPushButton("Block Websites")
+
+        # Bulk import of blocklist files, blocked for the duration above
+        self.import_button = QPushButton("Import Blocklist...")
+        self.expand_variants_checkbox = QCheckBox("Also block www. and m. variants")
         
-        # Active blocks list
-        self.active_blocks_frame = QFrame()
-        self.active_blocks_layout = QVBoxLayout()
-        self.active_blocks_frame.setLayout(self.active_blocks_layout)
+        # Active blocks list, refreshed by one shared countdown timer
+        self.active_blocks_model = ActiveBlocksModel(self.blocking_manager, self)
+        self.active_blocks_view = QListView()
+        self.active_blocks_view.setModel(self.active_blocks_model)
+        self.active_blocks_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.active_blocks_view.setUniformItemSizes(True)
+        self.unblock_button = QPushButton("Unblock Selected")
+        self.countdown_timer = QTimer(self)
         
         layout.addLayout(form_layout)
         layout.addWidget(self.block_button)
+        layout.addWidget(self.import_button)
+        layout.addWidget(self.expand_variants_checkbox)
         layout.addWidget(QLabel("Currently Blocked Websites:"))
-        layout.addWidget(self.active_blocks_frame)
+        layout.addWidget(self.active_blocks_view)
+        layout.addWidget(self.unblock_button)
         
         self.block_tab.setLayout(layout)
 
@@ -256,11 +291,16 @@ class BlockerApp(QWidget):
     def setup_connections(self):
         """Set up signal/slot connections"""
         self.block_button.clicked.connect(self.handle_block_request)
+        self.import_button.clicked.connect(self.handle_import_request)
         self.reblock_button.clicked.connect(self.handle_reblock_request)
         
         # Connect blocking manager signals
-        self.blocking_manager.website_blocked.connect(self.handle_website_blocked)
-        self.blocking_manager.website_unblocked.connect(self.handle_website_unblocked)
+        self.blocking_manager.websites_blocked.connect(self.handle_websites_blocked)
+        self.blocking_manager.websites_unblocked.connect(self.handle_websites_unblocked)
+
+        self.unblock_button.clicked.connect(self.handle_unblock_request)
+        self.countdown_timer.timeout.connect(self.refresh_visible_blocks)
+        self.countdown_timer.start(1000)
         self.blocking_manager.error_occurred.connect(self.show_error)
 
     def handle_block_request(self):
@@ -284,6 +324,28 @@ class BlockerApp(QWidget):
             logging.error(f"Unexpected error in handle_block_request: {e}")
             self.show_error(f"Unexpected error: {e}")
 
+    def handle_import_request(self):
+        """Handle blocklist import request"""
+        try:
+            duration_text = self.duration_input.text()
+            if not duration_text.isdigit():
+                raise BlockerException("Please enter the duration to block the imported websites for")
+
+            path, _ = QFileDialog.getOpenFileName(self, "Import Blocklist", "",
+                                                  "Blocklists (*.txt *.hosts hosts);;All files (*)")
+            if not path:
+                return
+            duration = int(duration_text) * 60
+            count = self.blocking_manager.import_blocklist(path, duration, self.expand_variants_checkbox.isChecked())
+            if not count:
+                raise BlockerException("No websites found in the blocklist")
+
+        except BlockerException as e:
+            self.show_error(str(e))
+        except Exception as e:
+            logging.error(f"Unexpected error in handle_import_request: {e}")
+            self.show_error(f"Unexpected error: {e}")
+
     def handle_reblock_request(self):
         """Handle website reblocking request from history"""
         try:
@@ -306,46 +368,39 @@ class BlockerApp(QWidget):
             logging.error(f"Unexpected error in handle_reblock_request: {e}")
             self.show_error(f"Unexpected error: {e}")
 
-    def handle_website_blocked(self, website: str, duration: int):
-        """Handle website blocked event"""
-        self.update_active_blocks_ui()
-        self.add_to_history(website)
+    def handle_unblock_request(self):
+        """Handle unblocking of the selected active blocks"""
+        rows = {index.row() for index in self.active_blocks_view.selectionModel().selectedIndexes()}
+        if rows:
+            self.blocking_manager.unblock_websites([self.active_blocks_model.website(row) for row in sorted(rows)])
+
+    def handle_websites_blocked(self, websites: List[str], duration: int):
+        """Handle websites blocked event"""
+        self.active_blocks_model.add_websites(websites)
+        self.add_to_history(websites)
         self.websites_input.clear()
         self.duration_input.clear()
 
-    def handle_website_unblocked(self, website: str):
-        """Handle website unblocked event"""
-        self.update_active_blocks_ui()
-
-    def update_active_blocks_ui(self):
-        """Update the UI display of active blocks"""
-        # Clear existing layouts
-        while self.active_blocks_layout.count():
-            item = self.active_blocks_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-
-        # Add current blocks
-        for website, duration, _ in self.blocking_manager.active_blocks:
-            block_widget = QFrame()
-            block_layout = QHBoxLayout()
-            
-            label = QLabel(f"{website} - {duration//60}:{duration%60:02d} remaining")
-            unblock_button = QPushButton("Unblock")
-            unblock_button.clicked.connect(lambda checked, w=website: 
-                                        self.blocking_manager.unblock_websites([w]))
-            
-            block_layout.addWidget(label)
-            block_layout.addWidget(unblock_button)
-            block_widget.setLayout(block_layout)
-            
-            self.active_blocks_layout.addWidget(block_widget)
-
-    def add_to_history(self, website: str):
-        """Add website to history"""
-        if website not in self.history_manager:
-            self.history_manager.add(website)
-            self.history_list.addItem(website)
+    def handle_websites_unblocked(self, websites: List[str]):
+        """Handle websites unblocked event"""
+        self.active_blocks_model.remove_websites(websites)
+
+    def refresh_visible_blocks(self):
+        """Update the remaining time of the rows currently on screen"""
+        rows = self.active_blocks_model.rowCount()
+        if not rows or not self.active_blocks_view.isVisible():
+            return
+        viewport = self.active_blocks_view.viewport().rect()
+        first = self.active_blocks_view.indexAt(viewport.topLeft())
+        last = self.active_blocks_view.indexAt(viewport.bottomLeft())
+        self.active_blocks_model.refresh_rows(first.row() if first.isValid() else 0,
+                                              last.row() if last.isValid() else rows - 1)
+
+    def add_to_history(self, websites: List[str]):
+        """Add websites to history"""
+        new_websites = [website for website in dict.fromkeys(websites) if website not in self.history_manager]
+        self.history_manager.update(new_websites)
+        self.history_list.addItems(new_websites)
 
     def show_error(self, message: str):
         """Show error message to user"""
@@ -386,12 +441,20 @@ def main():
         app = QApplication(sys.argv)
         blocker = BlockerApp()
         blocker.show()
-        sys.exit(app.exec_())
+        exit_code = app.exec_()
     except Exception as e:
         logging.critical(f"Critical application error: {e}")
         QMessageBox.critical(None, "Critical Error", 
                            f"Application failed to start: {str(e)}")
         sys.exit(1)
+    # Blocks and unblocks are written behind; make sure the last ones reach the hosts file
+    try:
+        blocker.blocking_manager.flush(timeout=10)
+    except BlockerException as e:
+        logging.error(f"Could not write pending changes to the hosts file on exit: {e}")
+        QMessageBox.warning(None, "Shutdown Warning",
+                            f"The last changes may not have been written to the hosts file: {str(e)}")
+    sys.exit(exit_code)
 
 class BlockerTimer(QObject):
     """Timer class for handling block durations"""
@@ -427,87 +490,6 @@ class BlockerTimer(QObject):
         seconds = self.remaining % 60
         return minutes, seconds
 
-class Configuration:
-    """Configuration management class"""
-    
-    def __init__(self):
-        self.config_file = "blocker_config.json"
-        self.default_config = {
-            "auto_start": False,
-            "show_notifications": True,
-            "default_duration": 30,
-            "backup_hosts": True
-        }
-        self.current_config = self.load_config()
-
-    def load_config(self) -> dict:
-        """Load configuration from file"""
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    return json.load(f)
-            return self.default_config.copy()
-        except Exception as e:
-            logging.error(f"Error loading configuration: {e}")
-            return self.default_config.copy()
-
-    def save_config(self) -> None:
-        """Save configuration to file"""
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.current_config, f, indent=4)
-        except Exception as e:
-            logging.error(f"Error saving configuration: {e}")
-            raise BlockerException(f"Could not save configuration: {e}")
-
-class HostsBackup:
-    """Handles backup and restoration of hosts file"""
-    
-    def __init__(self):
-        self.backup_dir = "hosts_backups"
-        self.ensure_backup_dir()
-        
-    def ensure_backup_dir(self) -> None:
-        """Ensure backup directory exists"""
-        try:
-            if not os.path.exists(self.backup_dir):
-                os.makedirs(self.backup_dir)
-        except Exception as e:
-            logging.error(f"Error creating backup directory: {e}")
-            raise BlockerException(f"Could not create backup directory: {e}")
-            
-    def create_backup(self) -> None:
-        """Create a backup of the hosts file"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(self.backup_dir, f"hosts_backup_{timestamp}")
-            
-            with open(HostsFileManager().hosts_path, 'r') as source:
-                with open(backup_path, 'w') as target:
-                    target.write(source.read())
-                    
-            logging.info(f"Created hosts file backup: {backup_path}")
-        except Exception as e:
-            logging.error(f"Error creating hosts backup: {e}")
-            raise BlockerException(f"Could not create hosts backup: {e}")
-            
-    def restore_backup(self, backup_file: str) -> None:
-        """Restore hosts file from backup"""
-        try:
-            backup_path = os.path.join(self.backup_dir, backup_file)
-            
-            if not os.path.exists(backup_path):
-                raise BlockerException("Backup file does not exist")
-                
-            with open(backup_path, 'r') as source:
-                with open(HostsFileManager().hosts_path, 'w') as target:
-                    target.write(source.read())
-                    
-            logging.info(f"Restored hosts file from backup: {backup_path}")
-        except Exception as e:
-            logging.error(f"Error restoring hosts backup: {e}")
-            raise BlockerException(f"Could not restore hosts backup: {e}")
-
 class SettingsDialog(QDialog):
     """Settings dialog for the application"""
     
@@ -0,0 +1,140 @@
+"""Microbenchmark of the per-request overhead of GraphQL and iPhone queries.
+
+Usage:
+    python bench_requests.py [--requests 2000]
+
+Compares preparing a query from a copy of the session, as graphql_query() and
+get_iphone_json() did before, with sending it through the session itself. The
+GraphQL headers come from a precomputed template; the iPhone headers are still
+built per query by _iphone_http_header(), and preparing them is not reliably
+faster than before. Then times both against a local keep-alive HTTP server,
+where the copies also pay for a new connection per query.
+"""
+
+import argparse
+import http.server
+import json
+import threading
+import time
+
+import requests
+
+from instaloader.instaloadercontext import InstaloaderContext, copy_session
+
+SESSION_COOKIES = {"csrftoken": "token", "sessionid": "session", "ds_user_id": "1234", "mid": "mid",
+                   "ig_did": "device", "rur": '"RUR"'}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps({"status": "ok", "data": {}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def copied_graphql_request(context, url, params):
+    """The request graphql_query() built before: a copy of the session with its headers adjusted"""
+    tmpsession = copy_session(context._session, context.request_timeout)
+    tmpsession.headers.update(context._default_http_header(empty_session_only=True))
+    del tmpsession.headers['Connection']
+    del tmpsession.headers['Content-Length']
+    tmpsession.headers['authority'] = 'www.instagram.com'
+    tmpsession.headers['scheme'] = 'https'
+    tmpsession.headers['accept'] = '*/*'
+    tmpsession.headers['referer'] = 'https%3A//www.instagram.com/instagram/'
+    return tmpsession, requests.Request('GET', url, params=params)
+
+
+def templated_graphql_request(context, url, params):
+    """The request graphql_query() builds now: the session with a copy of the header template"""
+    headers = context._graphql_headers.copy()
+    headers['referer'] = 'https%3A//www.instagram.com/instagram/'
+    return context._session, requests.Request('GET', url, params=params, headers=headers)
+
+
+def copied_iphone_request(context, url, params):
+    """The request get_iphone_json() built before"""
+    tempsession = copy_session(context._session, context.request_timeout)
+    tempsession.headers['ig-intended-user-id'] = str(context.user_id)
+    tempsession.headers['x-pigeon-rawclienttime'] = '{:.6f}'.format(time.time())
+    tempsession.headers.update(context.iphone_headers)
+    cookies = tempsession.cookies.get_dict().copy()
+    for key, value in {'x-mid': 'mid', 'ig-u-ds-user-id': 'ds_user_id', 'x-ig-device-id': 'ig_did',
+                       'x-ig-family-device-id': 'ig_did', 'family_device_id': 'ig_did'}.items():
+        if value in cookies:
+            if key not in tempsession.headers:
+                tempsession.headers[key] = cookies[value]
+            else:
+                tempsession.cookies.pop(value, None)
+    for header in ['Host', 'Origin', 'X-Instagram-AJAX', 'X-Requested-With', 'Referer']:
+        tempsession.headers.pop(header, None)
+    return tempsession, requests.Request('GET', url, params=params)
+
+
+def templated_iphone_request(context, url, params):
+    """The request get_iphone_json() builds now: the session with headers built for this query"""
+    headers = context._iphone_http_header(context._session.cookies.get_dict(), context._session.headers)
+    return context._session, requests.Request('GET', url, params=params, headers=headers)
+
+
+def timed(label, count, function):
+    started = time.perf_counter()
+    for _ in range(count):
+        function()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<44} {elapsed / count * 1e6:9.1f} µs/request")
+
+
+def prepare(build, context, url):
+    session, request = build(context, url, {'query_hash': 'hash', 'variables': '{"id":"1","first":50}'})
+    session.prepare_request(request)
+
+
+def send(build, context, url):
+    session, request = build(context, url, {'query_hash': 'hash', 'variables': '{"id":"1","first":50}'})
+    response = session.send(session.prepare_request(request), timeout=context.request_timeout)
+    response.json()
+    if session is not context._session:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request overhead of Instagram queries.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per measurement")
+    args = parser.parse_args()
+
+    context = InstaloaderContext(sleep=False, quiet=True)
+    context.load_session("user", SESSION_COOKIES)
+    context.user_id = 1234
+    url = "https://www.instagram.com/graphql/query"
+
+    print("Preparing requests (no I/O)")
+    timed("graphql: copy_session", args.requests, lambda: prepare(copied_graphql_request, context, url))
+    timed("graphql: header template", args.requests, lambda: prepare(templated_graphql_request, context, url))
+    timed("iphone: copy_session", args.requests, lambda: prepare(copied_iphone_request, context, url))
+    timed("iphone: session, per-query headers", args.requests, lambda: prepare(templated_iphone_request, context, url))
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    local_url = "http://127.0.0.1:{}/graphql/query".format(server.server_address[1])
+    count = min(args.requests, 500)
+    print(f"Round trips to a local keep-alive server ({count} requests)")
+    timed("graphql: copy_session", count, lambda: send(copied_graphql_request, context, local_url))
+    timed("graphql: header template", count, lambda: send(templated_graphql_request, context, local_url))
+    timed("iphone: copy_session", count, lambda: send(copied_iphone_request, context, local_url))
+    timed("iphone: session, per-query headers", count, lambda: send(templated_iphone_request, context, local_url))
+    server.shutdown()
+    context.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1025 @@
+"""Hosts file blocking without any GUI.
+
+Used by Blocker.py and by the headless daemon in blocker_daemon.py.
+"""
+
+import os
+import json
+import time
+import hashlib
+import heapq
+import shutil
+import threading
+import logging
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple, Optional
+from datetime import datetime
+
+class BlockerException(Exception):
+    """Custom exception for website blocker specific errors"""
+    pass
+
+# Hostname labels of letters, digits, hyphens and underscores, separated by dots
+WEBSITE_PATTERN = re.compile(r"(?:[A-Za-z0-9_-]{1,63}\.)*[A-Za-z0-9_-]{1,63}")
+
+class HostsFileManager:
+    """Manages operations on the hosts file
+
+    Blocked websites live in a section of the hosts file delimited by
+    BEGIN_MARKER and END_MARKER, which the manager owns. The section is kept
+    at the end of the file and indexed in memory, and the text of the rest of
+    the file is rendered once and reused, so a change only renders the section
+    again. Every change is still written as a complete temp file that replaces
+    the hosts file atomically, so writing costs time proportional to the whole
+    file; changes that leave the file as it is are not written at all.
+
+    The rest of the file is parsed once into (ip, hostnames) records with a
+    hash index on hostname, so websites are matched exactly. Entries outside
+    the section belong to the user: websites they already redirect are not
+    added to the section, and they are only edited when a removal explicitly
+    asks for it, which drops x.com from them but never touches box.com.
+
+    Edits by other programs are noticed by comparing the file's
+    (mtime_ns, size, inode) with those after the last read or write; only
+    then is the file parsed again, keeping the outside edits and restoring
+    the managed section if they changed it.
+    """
+    BEGIN_MARKER = "# BEGIN Website Blocker"
+    END_MARKER = "# END Website Blocker"
+
+    def __init__(self, hosts_path: Optional[str] = None):
+        self.hosts_path = hosts_path or ("/etc/hosts" if os.name != 'nt' else r"C:\Windows\System32\drivers\etc\hosts")
+        self.redirect = "127.0.0.1"
+        self._lock = threading.Lock()
+        self._outside: Optional[List[str]] = None  # Lines of the hosts file outside the managed section
+        self._records: Dict[int, Tuple[str, List[str]]] = {}  # Line number -> (ip, hostnames) outside the section
+        self._index: Dict[str, List[int]] = {}  # Hostname -> line numbers of its records outside the section
+        self.blocked: Dict[str, None] = {}  # Websites in the managed section, in insertion order
+        self._signature: Optional[Tuple[int, int, int]] = None  # File signature when last read or written
+        self._rendered_outside: Tuple[Optional[List[str]], str] = (None, "")  # Outside lines and their joined text
+
+    def validate_website(self, website: str) -> bool:
+        """Validate website format"""
+        return WEBSITE_PATTERN.fullmatch(website.strip()) is not None
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[Tuple[str, List[str]]]:
+        """Split a hosts file line into its ip and hostnames, or None if it has no entry"""
+        fields = line.split("#", 1)[0].split()
+        if len(fields) < 2:
+            return None
+        return fields[0], fields[1:]
+
+    def _file_signature(self) -> Tuple[int, int, int]:
+        stat = os.stat(self.hosts_path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def load(self) -> None:
+        """Read the hosts file and index its entries"""
+        self._signature = self._file_signature()  # Taken first, so that edits while reading are noticed later
+        with open(self.hosts_path, "r") as file:
+            lines = file.readlines()
+        outside = []
+        records = {}
+        index = {}
+        blocked = {}
+        in_section = False
+        for line in lines:
+            stripped = line.strip()
+            if stripped == self.BEGIN_MARKER:
+                in_section = True
+                continue
+            if stripped == self.END_MARKER:
+                in_section = False
+                continue
+            record = self.parse_line(stripped)
+            if in_section:
+                if record is not None:
+                    blocked.update(dict.fromkeys(record[1]))
+                continue
+            if record is not None:
+                number = len(outside)
+                records[number] = record
+                for hostname in record[1]:
+                    index.setdefault(hostname, []).append(number)
+            outside.append(line)
+        if outside and not outside[-1].endswith("\n"):
+            outside[-1] += "\n"
+        self._outside = outside
+        self._records = records
+        self._index = index
+        self.blocked = blocked
+
+    def reconcile(self) -> bool:
+        """Re-read the hosts file if another program changed it; returns True if it had"""
+        try:
+            with self._lock:
+                return self._reconcile()
+        except PermissionError:
+            logging.error("Permission denied while accessing hosts file")
+            raise BlockerException("Permission denied. Please run as administrator.")
+        except IOError as e:
+            logging.error(f"IO Error while accessing hosts file: {e}")
+            raise BlockerException(f"Error accessing hosts file: {e}")
+
+    def _reconcile(self) -> bool:
+        if self._outside is None:
+            self.load()
+            return False
+        if self._file_signature() == self._signature:
+            return False
+        started = time.perf_counter()
+        blocked = self.blocked
+        self.load()
+        restored = list(self.blocked) != list(blocked)
+        if restored:
+            # The managed section is ours: keep the outside edits, but not changes to the section
+            self._write(self._outside, blocked)
+            self.blocked = blocked
+        logging.info(f"Hosts file was changed externally; reparsed {len(self._outside)} lines "
+                     f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+                     f"{' and restored the managed section' if restored else ''}")
+        return True
+
+    def _redirected_outside(self, website: str) -> List[int]:
+        """Line numbers of the entries outside the section that redirect the website"""
+        return [number for number in self._index.get(website, ())
+                if self._records[number][0] == self.redirect]
+
+    def redirected_outside(self, websites: Iterable[str]) -> Set[str]:
+        """The websites that entries outside the managed section already redirect"""
+        try:
+            with self._lock:
+                self._reconcile()
+                return {website for website in websites if self._redirected_outside(website)}
+        except PermissionError:
+            logging.error("Permission denied while accessing hosts file")
+            raise BlockerException("Permission denied. Please run as administrator.")
+        except IOError as e:
+            logging.error(f"IO Error while accessing hosts file: {e}")
+            raise BlockerException(f"Error accessing hosts file: {e}")
+
+    def add_websites(self, websites: List[str]) -> None:
+        """Add websites to hosts file"""
+        for website in websites:
+            if not self.validate_website(website):
+                raise BlockerException(f"Invalid website format: {website}")
+        if self.apply_changes(add=[website.strip() for website in websites]):
+            logging.info(f"Added websites to hosts file: {websites}")
+
+    def remove_websites(self, websites: List[str], include_outside: bool = False) -> None:
+        """Remove websites from the managed section, and with include_outside from the rest of the hosts file"""
+        websites = [website.strip() for website in websites]
+        if include_outside:
+            changed = self.apply_changes(remove_outside=websites)
+        else:
+            changed = self.apply_changes(remove=websites)
+        if changed:
+            logging.info(f"Removed websites from hosts file: {websites}")
+
+    def apply_changes(self, add: Iterable[str] = (), remove: Iterable[str] = (),
+                      remove_outside: Iterable[str] = ()) -> bool:
+        """Apply additions and removals in one write; returns False if nothing changed
+
+        Websites in remove are only dropped from the managed section, those in
+        remove_outside also from the entries outside it that redirect them."""
+        try:
+            with self._lock:
+                self._reconcile()
+                blocked = dict(self.blocked)
+                edits: Dict[int, List[str]] = {}  # Line number -> remaining hostnames of edited outside entries
+                for website in remove:
+                    blocked.pop(website, None)
+                for website in remove_outside:
+                    blocked.pop(website, None)
+                    for number in self._redirected_outside(website):
+                        hostnames = edits.get(number, self._records[number][1])
+                        edits[number] = [hostname for hostname in hostnames if hostname != website]
+                for website in add:
+                    if website not in blocked and not self._redirected_outside(website):
+                        blocked[website] = None
+                if not edits and list(blocked) == list(self.blocked):
+                    return False
+                outside = self._outside
+                if edits:
+                    outside = list(outside)
+                    for number, hostnames in edits.items():
+                        outside[number] = f"{self.redirect} {' '.join(hostnames)}\n" if hostnames else ""
+                self._write(outside, blocked)
+                self._outside = outside
+                self.blocked = blocked
+                for number, hostnames in edits.items():
+                    for hostname in set(self._records[number][1]) - set(hostnames):
+                        self._index[hostname].remove(number)
+                        if not self._index[hostname]:
+                            del self._index[hostname]
+                    if hostnames:
+                        self._records[number] = (self.redirect, hostnames)
+                    else:
+                        del self._records[number]
+                return True
+        except PermissionError:
+            logging.error("Permission denied while accessing hosts file")
+            raise BlockerException("Permission denied. Please run as administrator.")
+        except IOError as e:
+            logging.error(f"IO Error while accessing hosts file: {e}")
+            raise BlockerException(f"Error accessing hosts file: {e}")
+
+    def _write(self, outside: List[str], blocked: Dict[str, None]) -> None:
+        """Atomically replace the hosts file with the outside lines and the given section"""
+        # The outside lines only change on external edits and removals from them, which replace the list
+        if self._rendered_outside[0] is not outside:
+            self._rendered_outside = (outside, "".join(outside))
+        section = [self.BEGIN_MARKER + "\n"]
+        section.extend(f"{self.redirect} {website}\n" for website in blocked)
+        section.append(self.END_MARKER + "\n")
+        temp_path = self.hosts_path + ".tmp"
+        try:
+            with open(temp_path, "w") as file:
+                file.write(self._rendered_outside[1])
+                file.writelines(section)
+                file.flush()
+                os.fsync(file.fileno())
+            shutil.copymode(self.hosts_path, temp_path)
+            os.replace(temp_path, self.hosts_path)
+            self._signature = self._file_signature()
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+class BlocklistImporter:
+    """Reads websites from blocklist files
+
+    Understands hosts-format lines ("0.0.0.0 ads.example"), plain domains and
+    AdBlock-style domain rules ("||ads.example^"); comments and other rules
+    are skipped. Files are streamed line by line and the websites deduplicated
+    in order, optionally together with their www. and m. variants.
+    """
+    LOCAL_HOSTNAMES = {"localhost", "localhost.localdomain", "local", "broadcasthost",
+                       "ip6-localhost", "ip6-loopback", "ip6-localnet", "ip6-mcastprefix",
+                       "ip6-allnodes", "ip6-allrouters", "ip6-allhosts", "0.0.0.0"}
+    VARIANT_PREFIXES = ("www.", "m.")
+
+    def __init__(self, expand_variants: bool = False):
+        self.expand_variants = expand_variants
+
+    def parse_line(self, line: str) -> List[str]:
+        """Return the websites a blocklist line blocks"""
+        line = line.strip()
+        if not line or line[0] in "#![@" or "##" in line or "#@#" in line:
+            return []  # Comments, headers, exceptions and element hiding rules
+        if line.startswith("||"):
+            # AdBlock domain rule, e.g. ||ads.example^$third-party
+            end = len(line)
+            for separator in "^$/":
+                position = line.find(separator, 2)
+                if position != -1:
+                    end = min(end, position)
+            candidates = [line[2:end]]
+        else:
+            fields = line.split("#", 1)[0].split()
+            candidates = fields[1:] if len(fields) > 1 else fields
+        return [website.lower() for website in candidates
+                if website.lower() not in self.LOCAL_HOSTNAMES and WEBSITE_PATTERN.fullmatch(website)]
+
+    def iter_websites(self, path: str) -> Iterator[str]:
+        """Stream the websites of a blocklist file, possibly with duplicates"""
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            for line in file:
+                for website in self.parse_line(line):
+                    yield website
+                    if self.expand_variants:
+                        base = website
+                        for prefix in self.VARIANT_PREFIXES:
+                            if base.startswith(prefix):
+                                base = base[len(prefix):]
+                                break
+                        yield base
+                        for prefix in self.VARIANT_PREFIXES:
+                            yield prefix + base
+
+    def read(self, path: str) -> List[str]:
+        """Return the distinct websites of a blocklist file in file order"""
+        try:
+            return list(dict.fromkeys(self.iter_websites(path)))
+        except IOError as e:
+            logging.error(f"Error reading blocklist {path}: {e}")
+            raise BlockerException(f"Error reading blocklist: {e}")
+
+class HostsWatcher:
+    """Polls the hosts file for changes by other programs
+
+    Each poll only stats the file; HostsFileManager.reconcile parses it again
+    when its signature changed.
+    """
+
+    def __init__(self, hosts_manager: HostsFileManager, interval: float = 2.0):
+        self.hosts_manager = hosts_manager
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="hosts-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.hosts_manager.reconcile()
+            except Exception as e:
+                logging.error(f"Error checking hosts file for changes: {e}")
+
+class HostsWriteBehind:
+    """Collects hosts file changes and applies them in batches
+
+    Changes submitted within delay seconds of the first pending one are merged,
+    the last change of a website winning, and applied on a writer thread with a
+    single HostsFileManager.apply_changes call, i.e. one atomic rewrite. flush()
+    is a barrier for callers that need the changes on disk.
+    """
+
+    def __init__(self, hosts_manager: HostsFileManager, delay: float = 0.25,
+                 on_error: Optional[Callable[[Exception], None]] = None, backup: Optional["HostsBackup"] = None):
+        self.hosts_manager = hosts_manager
+        self.delay = delay
+        self.on_error = on_error
+        self.backup = backup  # Backs the hosts file up before each batch, if set
+        self._pending: Dict[str, bool] = {}  # Website -> True to block, False to unblock
+        self._pending_outside: Set[str] = set()  # Websites to unblock outside the managed section, too
+        self._pending_since = 0.0
+        self._submitted = 0  # Changes submitted so far
+        self._applied = 0  # Changes submitted before the last batch was applied
+        self._error: Optional[Exception] = None
+        self._flushing = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="hosts-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, add: Iterable[str] = (), remove: Iterable[str] = (), remove_outside: Iterable[str] = ()) -> None:
+        """Queue websites to block and unblock, see HostsFileManager.apply_changes"""
+        add, remove, remove_outside = list(add), list(remove), list(remove_outside)
+        if not (add or remove or remove_outside):
+            return  # Nothing for the writer to apply, so nothing for flush() to wait for
+        with self._condition:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            for website in remove:
+                self._pending[website] = False
+                self._pending_outside.discard(website)
+            for website in remove_outside:
+                self._pending[website] = False
+                self._pending_outside.add(website)
+            for website in add:
+                self._pending[website] = True
+                self._pending_outside.discard(website)
+            self._submitted += 1
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until every change submitted so far is written to the hosts file"""
+        with self._condition:
+            target = self._submitted
+            self._flushing = True
+            self._condition.notify_all()
+            if not self._condition.wait_for(lambda: self._applied >= target, timeout):
+                raise BlockerException("Timed out writing the hosts file")
+            error, self._error = self._error, None
+        if error is not None:
+            raise BlockerException(f"Error writing hosts file: {error}")
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if self._pending:
+                        remaining = self._pending_since + self.delay - time.monotonic()
+                        if self._flushing or remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._flushing = False
+                        self._condition.wait()
+                changes, self._pending = self._pending, {}
+                outside, self._pending_outside = self._pending_outside, set()
+                submitted = self._submitted
+            add = [website for website, blocked in changes.items() if blocked]
+            remove = [website for website, blocked in changes.items() if not blocked and website not in outside]
+            remove_outside = [website for website, blocked in changes.items() if not blocked and website in outside]
+            error = None
+            if self.backup is not None:
+                try:
+                    self.backup.create_backup()
+                except BlockerException as e:
+                    logging.error(f"Writing hosts file without backup: {e}")
+            try:
+                if self.hosts_manager.apply_changes(add=add, remove=remove, remove_outside=remove_outside):
+                    logging.info(f"Wrote {len(add)} blocked and {len(remove) + len(remove_outside)} "
+                                 f"unblocked websites to hosts file")
+            except Exception as e:
+                logging.error(f"Error writing hosts file: {e}")
+                error = e
+            with self._condition:
+                self._applied = submitted
+                if error is not None:
+                    self._error = error
+                if not self._pending:
+                    self._flushing = False
+                self._condition.notify_all()
+            if error is not None and self.on_error is not None:
+                self.on_error(error)
+
+class BlockJournal:
+    """Append-only journal of block and unblock events
+
+    Every event is one JSON line with the websites and, for blocks, the
+    absolute time their block expires. Replaying the journal rebuilds the
+    active blocks in O(entries) after a restart. Once it holds many more
+    events than active blocks, it is compacted into one block event per
+    expiry time, written atomically.
+    """
+
+    def __init__(self, path: str = "block_journal.jsonl", compact_after: int = 1000):
+        self.path = path
+        self.compact_after = compact_after
+        self._events = 0  # Events in the journal file
+
+    def replay(self) -> Dict[str, float]:
+        """Return the active blocks recorded in the journal as website -> expiry time"""
+        active: Dict[str, float] = {}
+        self._events = 0
+        if not os.path.exists(self.path):
+            return active
+        with open(self.path, "r") as file:
+            for line in file:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # Partially written last event
+                self._events += 1
+                if event["op"] == "block":
+                    active.update(dict.fromkeys(event["websites"], event["expires_at"]))
+                else:
+                    for website in event["websites"]:
+                        active.pop(website, None)
+        return active
+
+    def record_block(self, websites: List[str], expires_at: float) -> None:
+        self._append({"op": "block", "websites": websites, "expires_at": expires_at})
+
+    def record_unblock(self, websites: List[str]) -> None:
+        self._append({"op": "unblock", "websites": websites})
+
+    def _append(self, event: dict) -> None:
+        with open(self.path, "a") as file:
+            file.write(json.dumps(event) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._events += 1
+
+    def needs_compaction(self, active_count: int) -> bool:
+        return self._events > max(self.compact_after, 2 * active_count)
+
+    def compact(self, active: Dict[str, float]) -> None:
+        """Rewrite the journal as the given active blocks"""
+        by_expiry: Dict[float, List[str]] = {}
+        for website, expires_at in active.items():
+            by_expiry.setdefault(expires_at, []).append(website)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            for expires_at, websites in by_expiry.items():
+                file.write(json.dumps({"op": "block", "websites": websites, "expires_at": expires_at}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._events = len(by_expiry)
+        logging.info(f"Compacted block journal to {len(active)} active blocks")
+
+class BlockScheduler:
+    """Expires blocks on a single thread
+
+    Expiry times are kept in a min-heap, so scheduling is O(log n). Cancelled
+    and rescheduled entries are left in the heap and skipped when they come up;
+    the heap is rebuilt once they make up most of it. Websites expiring within
+    coalesce_seconds of each other are passed to on_expire together, so they
+    are unblocked with a single hosts file write. on_expire is called without
+    the scheduler's lock and gets (website, expiry time) pairs, so that it can
+    skip websites blocked again meanwhile.
+    """
+
+    def __init__(self, on_expire: Callable[[List[Tuple[str, float]]], None], coalesce_seconds: float = 1.0):
+        self.on_expire = on_expire
+        self.coalesce_seconds = coalesce_seconds
+        self._heap: List[Tuple[float, int, str]] = []
+        self._expiries: Dict[str, float] = {}  # Website -> current expiry time
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="block-scheduler", daemon=True)
+        self._thread.start()
+
+    def schedule(self, website: str, expires_at: float) -> None:
+        """Expire the website at the given time, replacing any earlier schedule"""
+        with self._condition:
+            self._expiries[website] = expires_at
+            self._sequence += 1
+            heapq.heappush(self._heap, (expires_at, self._sequence, website))
+            self._compact()
+            if self._heap[0][2] == website:
+                self._condition.notify()
+
+    def cancel(self, website: str) -> None:
+        """Forget the website's expiry"""
+        with self._condition:
+            self._expiries.pop(website, None)
+            self._compact()
+
+    def expiry(self, website: str) -> Optional[float]:
+        with self._condition:
+            return self._expiries.get(website)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _compact(self) -> None:
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._expiries):
+            self._heap = [entry for entry in self._heap if self._expiries.get(entry[2]) == entry[0]]
+            heapq.heapify(self._heap)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    # Drop cancelled and rescheduled entries from the top
+                    while self._heap and self._expiries.get(self._heap[0][2]) != self._heap[0][0]:
+                        heapq.heappop(self._heap)
+                    if self._heap and self._heap[0][0] <= time.time():
+                        break
+                    self._condition.wait(self._heap[0][0] - time.time() if self._heap else None)
+                if self._stopped:
+                    return
+                deadline = time.time() + self.coalesce_seconds
+                expired = []
+                while self._heap and self._heap[0][0] <= deadline:
+                    expires_at, _, website = heapq.heappop(self._heap)
+                    if self._expiries.get(website) == expires_at:
+                        del self._expiries[website]
+                        expired.append((website, expires_at))
+            try:
+                self.on_expire(expired)
+            except Exception as e:
+                logging.error(f"Error expiring blocks: {e}")
+
+class Configuration:
+    """Configuration management class"""
+    
+    def __init__(self):
+        self.config_file = "blocker_config.json"
+        self.default_config = {
+            "auto_start": False,
+            "show_notifications": True,
+            "default_duration": 30,
+            "backup_hosts": True
+        }
+        self.current_config = self.load_config()
+
+    def load_config(self) -> dict:
+        """Load configuration from file"""
+        try:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r') as f:
+                    return json.load(f)
+            return self.default_config.copy()
+        except Exception as e:
+            logging.error(f"Error loading configuration: {e}")
+            return self.default_config.copy()
+
+    def save_config(self) -> None:
+        """Save configuration to file"""
+        try:
+            with open(self.config_file, 'w') as f:
+                json.dump(self.current_config, f, indent=4)
+        except Exception as e:
+            logging.error(f"Error saving configuration: {e}")
+            raise BlockerException(f"Could not save configuration: {e}")
+
+class HostsBackup:
+    """Handles backup and restoration of hosts file
+
+    Backups are content-addressed: a snapshot is stored under the SHA-256 of
+    the hosts file, and a backup of unchanged content only updates the time
+    of the latest backup.
+    Snapshots can be stored as line diffs against the previous one, with a
+    full copy at least every full_every snapshots, so reading one applies
+    fewer than full_every diffs. The latest snapshot's content is kept in
+    memory, so the next diff is taken without rebuilding it. index.json lists
+    the backups oldest first, so the latest one is found without listing the
+    directory, and only the newest keep backups are retained.
+    """
+
+    def __init__(self, hosts_path: Optional[str] = None, backup_dir: str = "hosts_backups",
+                 keep: int = 20, use_diffs: bool = True, full_every: int = 10):
+        self.hosts_path = hosts_path or HostsFileManager().hosts_path
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.index_path = os.path.join(backup_dir, "index.json")
+        self.keep = keep
+        self.use_diffs = use_diffs
+        self.full_every = full_every
+        self._latest_content: Tuple[Optional[str], bytes] = (None, b"")  # Hash and content of the latest snapshot
+        self.ensure_backup_dir()
+        self.index = self.load_index()
+
+    def ensure_backup_dir(self) -> None:
+        """Ensure backup directory exists"""
+        try:
+            os.makedirs(self.objects_dir, exist_ok=True)
+        except Exception as e:
+            logging.error(f"Error creating backup directory: {e}")
+            raise BlockerException(f"Could not create backup directory: {e}")
+
+    def load_index(self) -> dict:
+        """Load the backup index; it maps every snapshot hash to how it is stored"""
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading backup index: {e}")
+        # backups: [{"hash", "time"}], oldest first; objects: hash -> {"base": hash or None, "depth"}
+        return {"backups": [], "objects": {}}
+
+    def save_index(self) -> None:
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(temp_path, self.index_path)
+
+    def latest(self) -> Optional[dict]:
+        """The latest backup, or None"""
+        return self.index["backups"][-1] if self.index["backups"] else None
+
+    def create_backup(self) -> Optional[str]:
+        """Create a backup of the hosts file; returns its hash, or None if it is unchanged
+        since the latest backup, whose time is then updated"""
+        try:
+            with open(self.hosts_path, 'rb') as source:
+                content = source.read()
+            digest = hashlib.sha256(content).hexdigest()
+            latest = self.latest()
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if latest is not None and latest["hash"] == digest:
+                latest["time"] = now
+                self.save_index()
+                return None
+            if digest not in self.index["objects"]:
+                self._store(digest, content, latest["hash"] if latest else None)
+            self._latest_content = (digest, content)
+            self.index["backups"].append({"hash": digest, "time": now})
+            self._apply_retention()
+            self.save_index()
+            logging.info(f"Created hosts file backup: {digest[:12]}")
+            return digest
+        except Exception as e:
+            logging.error(f"Error creating hosts backup: {e}")
+            raise BlockerException(f"Could not create hosts backup: {e}")
+
+    def _store(self, digest: str, content: bytes, base: Optional[str]) -> None:
+        """Store a snapshot, as a diff against base if that is allowed and smaller"""
+        objects = self.index["objects"]
+        if self.use_diffs and base is not None and objects[base]["depth"] + 1 < self.full_every:
+            base_content = self._latest_content[1] if self._latest_content[0] == base else self.read(base)
+            base_lines = base_content.splitlines(keepends=True)
+            lines = content.splitlines(keepends=True)
+            # Changes are mostly confined to the managed section, so keeping the common
+            # leading and trailing lines finds them in linear time
+            prefix = 0
+            limit = min(len(base_lines), len(lines))
+            while prefix < limit and base_lines[prefix] == lines[prefix]:
+                prefix += 1
+            suffix = 0
+            while suffix < limit - prefix and base_lines[-1 - suffix] == lines[-1 - suffix]:
+                suffix += 1
+            operations = [[0, prefix], b"".join(lines[prefix:len(lines) - suffix]).decode("latin-1"),
+                          [len(base_lines) - suffix, len(base_lines)]]
+            diff = json.dumps({"base": base, "operations": operations}).encode("utf-8")
+            if len(diff) < len(content):
+                self._write_object(digest, diff)
+                objects[digest] = {"base": base, "depth": objects[base]["depth"] + 1}
+                return
+        self._write_object(digest, content)
+        objects[digest] = {"base": None, "depth": 0}
+
+    def _write_object(self, digest: str, data: bytes) -> None:
+        path = os.path.join(self.objects_dir, digest)
+        with open(path + ".tmp", 'wb') as target:
+            target.write(data)
+        os.replace(path + ".tmp", path)
+
+    def read(self, digest: str) -> bytes:
+        """Return the content of a snapshot, applying its diffs"""
+        # Walk back to the full copy the snapshot's diffs start from, then apply them oldest first
+        diffs = []
+        while True:
+            with open(os.path.join(self.objects_dir, digest), 'rb') as source:
+                data = source.read()
+            digest = self.index["objects"][digest]["base"]
+            if digest is None:
+                break
+            diffs.append(data)
+        for diff in reversed(diffs):
+            base_lines = data.splitlines(keepends=True)
+            parts = []
+            for operation in json.loads(diff)["operations"]:
+                if isinstance(operation, list):
+                    parts.extend(base_lines[operation[0]:operation[1]])
+                else:
+                    parts.append(operation.encode("latin-1"))
+            data = b"".join(parts)
+        return data
+
+    def _apply_retention(self) -> None:
+        """Drop the oldest backups beyond keep, and the snapshots nothing needs any more"""
+        backups = self.index["backups"]
+        if len(backups) <= self.keep:
+            return
+        del backups[:len(backups) - self.keep]
+        objects = self.index["objects"]
+        needed = set()
+        for backup in backups:
+            digest = backup["hash"]
+            while digest is not None and digest not in needed:
+                needed.add(digest)
+                digest = objects[digest]["base"]
+        for digest in set(objects) - needed:
+            del objects[digest]
+            os.unlink(os.path.join(self.objects_dir, digest))
+
+    def restore_backup(self, digest: str) -> None:
+        """Restore hosts file from backup"""
+        try:
+            if digest not in self.index["objects"]:
+                raise BlockerException("Backup does not exist")
+
+            content = self.read(digest)
+            temp_path = self.hosts_path + ".tmp"
+            with open(temp_path, 'wb') as target:
+                target.write(content)
+                target.flush()
+                os.fsync(target.fileno())
+            shutil.copymode(self.hosts_path, temp_path)
+            os.replace(temp_path, self.hosts_path)
+
+            logging.info(f"Restored hosts file from backup: {digest[:12]}")
+        except BlockerException:
+            raise
+        except Exception as e:
+            logging.error(f"Error restoring hosts backup: {e}")
+            raise BlockerException(f"Could not restore hosts backup: {e}")
+
+    def restore_latest(self) -> None:
+        """Restore hosts file from the latest backup"""
+        latest = self.latest()
+        if latest is None:
+            raise BlockerException("No backup to restore")
+        self.restore_backup(latest["hash"])
+
+class BlockingManager:
+    """Manages the blocking/unblocking of websites
+
+    Listeners added with add_listener are called once per operation, from the
+    thread that performed it, as listener(event, data) with the events
+    "blocked" (websites, duration, expires_at), "unblocked" (websites) and
+    "error" (message). They must not block.
+    """
+
+    def __init__(self, hosts_manager: Optional[HostsFileManager] = None, write_delay: float = 0.25,
+                 journal: Optional[BlockJournal] = None, backup: Optional[HostsBackup] = None,
+                 watch_interval: float = 2.0):
+        self.hosts_manager = hosts_manager or HostsFileManager()
+        self.journal = journal or BlockJournal()
+        self.active_blocks: Dict[str, float] = {}  # Website -> time its block expires
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str, dict], None]] = []
+        # Hosts file changes are written behind, bursts of them in one rewrite
+        self.writer = HostsWriteBehind(self.hosts_manager, write_delay,
+                                       on_error=lambda e: self._emit("error", message=f"Error writing hosts file: {e}"),
+                                       backup=backup)
+        self.scheduler = BlockScheduler(self.expire_blocks)
+        self.watcher = HostsWatcher(self.hosts_manager, watch_interval)
+        self.restore_blocks()
+
+    def add_listener(self, listener: Callable[[str, dict], None]) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, dict], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, event: str, **data) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(event, data)
+            except Exception as e:
+                logging.error(f"Error in {event} listener: {e}")
+
+    def restore_blocks(self) -> None:
+        """Re-arm the blocks recorded in the journal and unblock those that expired meanwhile"""
+        try:
+            with self._lock:
+                active = self.journal.replay()
+                now = time.time()
+                expired = [website for website, expires_at in active.items() if expires_at <= now]
+                for website, expires_at in active.items():
+                    if expires_at > now:
+                        self.active_blocks[website] = expires_at
+                        self.scheduler.schedule(website, expires_at)
+                if expired:
+                    self.writer.submit(remove=expired)
+                    self.journal.record_unblock(expired)
+                self._compact_journal()
+            logging.info(f"Restored {len(self.active_blocks)} active blocks, {len(expired)} expired meanwhile")
+        except Exception as e:
+            logging.error(f"Error restoring blocks from journal: {e}")
+
+    def _compact_journal(self) -> None:
+        if self.journal.needs_compaction(len(self.active_blocks)):
+            self.journal.compact(self.active_blocks)
+
+    def _plan_block(self, websites: List[str]) -> Tuple[List[str], List[str]]:
+        """Validate websites to block; returns those to block and those already blocked outside the blocker"""
+        cleaned_websites = [w.strip() for w in websites if self.hosts_manager.validate_website(w.strip())]
+        if not cleaned_websites:
+            raise BlockerException("No valid websites provided")
+        # Websites the user redirects outside the managed section stay blocked anyway, and must not expire
+        outside = self.hosts_manager.redirected_outside(cleaned_websites)
+        already_blocked = [w for w in cleaned_websites if w in outside]
+        if already_blocked:
+            cleaned_websites = [w for w in cleaned_websites if w not in outside]
+            listed = f"{', '.join(already_blocked[:10])}{' ...' if len(already_blocked) > 10 else ''}"
+            if not cleaned_websites:
+                raise BlockerException(f"Already blocked in the hosts file outside the blocker: {listed}")
+            logging.info(f"Not blocking {len(already_blocked)} websites already blocked outside the blocker: {listed}")
+        return cleaned_websites, already_blocked
+
+    def _record_block(self, websites: List[str], duration: int) -> float:
+        """Record and announce a block whose hosts file change is submitted; returns its expiry time
+
+        Must be called with the lock held."""
+        expires_at = time.time() + duration
+        self.journal.record_block(websites, expires_at)
+        for website in websites:
+            # Blocking an already blocked website only moves its expiry
+            self.scheduler.schedule(website, expires_at)
+            self.active_blocks[website] = expires_at
+        self._emit("blocked", websites=websites, duration=duration, expires_at=expires_at)
+        logging.info(f"Blocked {len(websites)} websites for {duration} seconds: "
+                     f"{', '.join(websites[:10])}{' ...' if len(websites) > 10 else ''}")
+        return expires_at
+
+    def _record_unblock(self, websites: List[str]) -> List[str]:
+        """Record and announce an unblock whose hosts file change is submitted; returns the websites that
+        were blocked
+
+        Must be called with the lock held."""
+        self.journal.record_unblock(websites)
+        unblocked = []
+        for website in websites:
+            self.scheduler.cancel(website)
+            if self.active_blocks.pop(website, None) is not None:
+                unblocked.append(website)
+        if unblocked:
+            self._emit("unblocked", websites=unblocked)
+            logging.info(f"Unblocked {len(unblocked)} websites: "
+                         f"{', '.join(unblocked[:10])}{' ...' if len(unblocked) > 10 else ''}")
+        return unblocked
+
+    def block(self, websites: List[str], duration: int) -> dict:
+        """Block websites for specified duration, raising BlockerException on errors"""
+        cleaned_websites, already_blocked = self._plan_block(websites)
+        with self._lock:
+            self.writer.submit(add=cleaned_websites)
+            expires_at = self._record_block(cleaned_websites, duration)
+            self._compact_journal()
+        return {"blocked": cleaned_websites, "already_blocked": already_blocked, "expires_at": expires_at}
+
+    def unblock(self, websites: List[str], include_outside: bool = False) -> dict:
+        """Unblock specified websites, raising on errors
+
+        Only the blocker's own entries are removed, unless include_outside asks
+        to also drop the websites from the user's entries in the hosts file."""
+        websites = [website.strip() for website in websites]
+        with self._lock:
+            if include_outside:
+                self.writer.submit(remove_outside=websites)
+            else:
+                self.writer.submit(remove=websites)
+            unblocked = self._record_unblock(websites)
+            self._compact_journal()
+        return {"unblocked": unblocked}
+
+    def bulk(self, changes: List[dict]) -> List[dict]:
+        """Apply several blocks and unblocks as one, raising BlockerException on errors
+
+        A change is {"op": "block", "websites", "duration"} or {"op": "unblock",
+        "websites", "include_outside"}. Every change is validated before any is
+        applied, so either all of them take effect or none, and their net effect
+        is written to the hosts file in one rewrite. Returns the result of each
+        change, as block() and unblock() would."""
+        planned = []
+        for number, change in enumerate(changes, 1):
+            try:
+                if change["op"] == "block":
+                    planned.append(self._plan_block(change["websites"]))
+                elif change["op"] == "unblock":
+                    planned.append(([website.strip() for website in change["websites"]], []))
+                else:
+                    raise BlockerException(f"Unknown operation: {change['op']}")
+            except BlockerException as e:
+                raise BlockerException(f"Change {number} of the bulk request: {e}")
+        # What happens to each website once all changes are applied in order
+        final: Dict[str, str] = {}
+        for change, (websites, _) in zip(changes, planned):
+            if change["op"] == "block":
+                kind = "add"
+            else:
+                kind = "remove_outside" if change.get("include_outside") else "remove"
+            for website in websites:
+                final[website] = kind
+        with self._lock:
+            self.writer.submit(**{kind: [website for website, final_kind in final.items() if final_kind == kind]
+                                  for kind in ("add", "remove", "remove_outside")})
+            results = []
+            for change, (websites, already_blocked) in zip(changes, planned):
+                if change["op"] == "block":
+                    expires_at = self._record_block(websites, change["duration"])
+                    results.append({"blocked": websites, "already_blocked": already_blocked,
+                                    "expires_at": expires_at})
+                else:
+                    results.append({"unblocked": self._record_unblock(websites)})
+            self._compact_journal()
+        return results
+
+    def block_websites(self, websites: List[str], duration: int) -> None:
+        """Block websites for specified duration, reporting errors to the listeners"""
+        try:
+            self.block(websites, duration)
+        except BlockerException as e:
+            logging.error(f"Error in block_websites: {e}")
+            self._emit("error", message=str(e))
+        except Exception as e:
+            logging.error(f"Unexpected error in block_websites: {e}")
+            self._emit("error", message=f"Unexpected error: {e}")
+
+    def expire_blocks(self, expired: List[Tuple[str, float]]) -> None:
+        """Unblock websites whose block expired, reporting errors to the listeners
+
+        Websites blocked again after the scheduler took their expiry have a new
+        expiry time by now and stay blocked."""
+        try:
+            with self._lock:
+                websites = [website for website, expires_at in expired
+                            if self.active_blocks.get(website) == expires_at]
+                if not websites:
+                    return
+                self.writer.submit(remove=websites)
+                self._record_unblock(websites)
+                self._compact_journal()
+        except Exception as e:
+            logging.error(f"Error in expire_blocks: {e}")
+            self._emit("error", message=f"Error unblocking websites: {e}")
+
+    def unblock_websites(self, websites: List[str]) -> None:
+        """Unblock specified websites, reporting errors to the listeners"""
+        try:
+            self.unblock(websites)
+        except Exception as e:
+            logging.error(f"Error in unblock_websites: {e}")
+            self._emit("error", message=f"Error unblocking websites: {e}")
+
+    def import_blocklist(self, path: str, duration: int, expand_variants: bool = False) -> dict:
+        """Block every website of a blocklist file as one batch"""
+        websites = BlocklistImporter(expand_variants).read(path)
+        logging.info(f"Importing {len(websites)} websites from {path}")
+        return self.block(websites, duration)
+
+    def list_blocks(self) -> Dict[str, float]:
+        """Return the active blocks as website -> expiry time"""
+        with self._lock:
+            return dict(self.active_blocks)
+
+    def subscribe(self, listener: Callable[[str, dict], None]) -> Callable[[], None]:
+        """Add a listener; returns a function that removes it again"""
+        self.add_listener(listener)
+        return lambda: self.remove_listener(listener)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until every block and unblock so far is written to the hosts file"""
+        self.writer.flush(timeout)
+
+    def remaining_seconds(self, website: str) -> int:
+        """Seconds until the website's block expires"""
+        return max(int(self.active_blocks.get(website, 0) - time.time()), 0)
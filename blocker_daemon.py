@@ -0,0 +1,385 @@
+"""Headless website blocker daemon with a JSON-over-Unix-socket API.
+
+Usage:
+    sudo python blocker_daemon.py serve
+    python blocker_daemon.py block --duration 30 example.com another.com
+    python blocker_daemon.py import blocklist.txt --duration 120 --variants
+    python blocker_daemon.py unblock example.com
+    python blocker_daemon.py list
+
+Every request is one JSON object on its own line, answered by one line:
+
+    {"op": "block", "websites": ["example.com"], "duration": 1800}
+    {"op": "unblock", "websites": ["example.com"], "include_outside": false}
+    {"op": "list"}
+    {"op": "bulk", "changes": [{"op": "block", ...}, {"op": "unblock", ...}]}
+    {"op": "import", "path": "/path/to/blocklist", "duration": 1800, "expand_variants": false}
+    {"op": "flush", "timeout": 30}
+    {"op": "subscribe"}
+
+Responses carry "ok" and either the result or "error". After "subscribe" the
+connection receives one line per event ("blocked", "unblocked", "error").
+Changes of a request, and of requests close together, are written to the
+hosts file in one rewrite. A bulk request applies all of its changes or, if
+any of them is invalid, none.
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import socketserver
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from blocker_core import BlockerException, BlockingManager, BlockJournal, HostsFileManager
+
+DEFAULT_SOCKET_PATH = "/var/run/website_blocker.sock"
+DEFAULT_FLUSH_TIMEOUT = 30.0  # Seconds a flush request waits for the hosts file at most
+
+
+def _required(request: dict, field: str) -> Any:
+    if field not in request:
+        raise BlockerException(f"Missing required field \"{field}\" for {request.get('op')}")
+    return request[field]
+
+
+def _websites(request: dict) -> List[str]:
+    websites = _required(request, "websites")
+    if not isinstance(websites, list) or not all(isinstance(website, str) for website in websites):
+        raise BlockerException("Field \"websites\" must be a list of strings")
+    if not websites:
+        raise BlockerException("Field \"websites\" must not be empty")
+    return websites
+
+
+def _duration(request: dict) -> int:
+    duration = _required(request, "duration")
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)) or duration <= 0:
+        raise BlockerException("Field \"duration\" must be a positive number of seconds")
+    return int(duration)
+
+
+def _change(number: int, change: Any) -> dict:
+    """Validate one change of a bulk request"""
+    try:
+        if not isinstance(change, dict):
+            raise BlockerException("Must be an object")
+        op = change.get("op")
+        if op == "block":
+            return {"op": op, "websites": _websites(change), "duration": _duration(change)}
+        if op == "unblock":
+            return {"op": op, "websites": _websites(change), "include_outside": bool(change.get("include_outside"))}
+        raise BlockerException(f"Unknown operation: {op}")
+    except BlockerException as e:
+        raise BlockerException(f"Change {number} of the bulk request: {e}")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Serves the requests of one connection"""
+
+    disconnect_poll_interval = 1.0  # Seconds between checks whether a subscriber went away
+
+    def handle(self) -> None:
+        manager = self.server.manager
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if request.get("op") == "subscribe":
+                    self._send({"ok": True})
+                    self._stream_events(manager)
+                    return
+                response = {"ok": True}
+                response.update(self.server.blocker_daemon.execute(request))
+            except BlockerException as e:
+                response = {"ok": False, "error": str(e)}
+            except Exception as e:
+                logging.error(f"Error handling request: {e}")
+                response = {"ok": False, "error": f"Unexpected error: {e}"}
+            self._send(response)
+
+    def _send(self, message: dict) -> None:
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream_events(self, manager: BlockingManager) -> None:
+        # Events are queued by the manager's threads and written by this one, so slow clients never block it
+        events = queue.SimpleQueue()
+        listener = lambda event, data: events.put(dict(data, event=event))
+        manager.add_listener(listener)
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=self.disconnect_poll_interval)
+                except queue.Empty:
+                    if self._client_closed():
+                        return
+                    continue
+                self._send(event)
+        except OSError:
+            pass  # Client went away
+        finally:
+            manager.remove_listener(listener)
+
+    def _client_closed(self) -> bool:
+        """Whether the client closed the connection; subscribers send nothing after subscribing"""
+        try:
+            return self.connection.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class BlockerDaemon:
+    """Serves a BlockingManager on a Unix socket"""
+
+    def __init__(self, manager: BlockingManager, socket_path: str = DEFAULT_SOCKET_PATH):
+        self.manager = manager
+        self.socket_path = socket_path
+        self._server: Optional[_UnixServer] = None
+
+    def execute(self, request: dict) -> dict:
+        """Execute one request and return its result, raising BlockerException on invalid requests"""
+        if not isinstance(request, dict):
+            raise BlockerException("Request must be a JSON object")
+        op = request.get("op")
+        if op == "block":
+            return self.manager.block(_websites(request), _duration(request))
+        if op == "unblock":
+            return self.manager.unblock(_websites(request), bool(request.get("include_outside", False)))
+        if op == "list":
+            return {"blocks": self.manager.list_blocks()}
+        if op == "bulk":
+            changes = _required(request, "changes")
+            if not isinstance(changes, list):
+                raise BlockerException("Field \"changes\" must be a list")
+            return {"results": self.manager.bulk([_change(number, change)
+                                                  for number, change in enumerate(changes, 1)])}
+        if op == "import":
+            path = _required(request, "path")
+            if not isinstance(path, str):
+                raise BlockerException("Field \"path\" must be a string")
+            return self.manager.import_blocklist(path, _duration(request),
+                                                 bool(request.get("expand_variants", False)))
+        if op == "flush":
+            timeout = request.get("timeout")
+            if timeout is None:
+                timeout = DEFAULT_FLUSH_TIMEOUT
+            elif isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+                raise BlockerException("Field \"timeout\" must be a positive number of seconds")
+            self.manager.flush(timeout)
+            return {}
+        if op == "ping":
+            return {}
+        raise BlockerException(f"Unknown operation: {op}")
+
+    def _bind(self) -> _UnixServer:
+        if os.path.exists(self.socket_path):
+            if BlockerClient(self.socket_path).is_running():
+                raise BlockerException(f"A blocker daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)  # Left behind by a daemon that did not shut down
+        server = _UnixServer(self.socket_path, _RequestHandler)
+        os.chmod(self.socket_path, 0o600)
+        server.manager = self.manager
+        server.blocker_daemon = self
+        return server
+
+    def serve_forever(self) -> None:
+        """Serve requests until shutdown() is called"""
+        self._server = self._bind()
+        logging.info(f"Blocker daemon listening on {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def start(self) -> None:
+        """Serve requests on a background thread"""
+        self._server = self._bind()
+        thread = threading.Thread(target=self._server.serve_forever, name="blocker-daemon", daemon=True)
+        thread.start()
+        logging.info(f"Blocker daemon listening on {self.socket_path}")
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class BlockerClient:
+    """Client of a BlockerDaemon, with the same interface as BlockingManager"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: Optional[float] = 60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            connection.connect(self.socket_path)
+        except OSError as e:
+            connection.close()
+            raise BlockerException(f"Blocker daemon is not running on {self.socket_path}: {e}")
+        return connection
+
+    def request(self, op: str, **params) -> dict:
+        """Send one request and return its result, raising BlockerException on errors"""
+        with self._lock:
+            if self._socket is None:
+                self._socket = self._connect()
+                self._file = self._socket.makefile("rwb")
+            try:
+                self._file.write((json.dumps(dict(params, op=op)) + "\n").encode("utf-8"))
+                self._file.flush()
+                line = self._file.readline()
+            except OSError as e:
+                self.close()
+                raise BlockerException(f"Lost connection to blocker daemon: {e}")
+            if not line:
+                self.close()
+                raise BlockerException("Blocker daemon closed the connection")
+        response = json.loads(line)
+        if not response.pop("ok"):
+            raise BlockerException(response["error"])
+        return response
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+    def is_running(self) -> bool:
+        try:
+            self.request("ping")
+            return True
+        except BlockerException:
+            return False
+
+    def block(self, websites: List[str], duration: int) -> dict:
+        return self.request("block", websites=websites, duration=duration)
+
+    def unblock(self, websites: List[str], include_outside: bool = False) -> dict:
+        return self.request("unblock", websites=websites, include_outside=include_outside)
+
+    def bulk(self, changes: List[dict]) -> List[dict]:
+        return self.request("bulk", changes=changes)["results"]
+
+    def import_blocklist(self, path: str, duration: int, expand_variants: bool = False) -> dict:
+        return self.request("import", path=os.path.abspath(path), duration=duration,
+                            expand_variants=expand_variants)
+
+    def list_blocks(self) -> Dict[str, float]:
+        return self.request("list")["blocks"]
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        self.request("flush", timeout=timeout)
+
+    def subscribe(self, listener: Callable[[str, dict], None]) -> Callable[[], None]:
+        """Call listener(event, data) from a background thread for every event; returns a function to stop"""
+        connection = self._connect()
+        connection.settimeout(None)
+        stream = connection.makefile("rwb")
+        stream.write(b'{"op": "subscribe"}\n')
+        stream.flush()
+        stream.readline()
+
+        def receive() -> None:
+            try:
+                for line in stream:
+                    data = json.loads(line)
+                    listener(data.pop("event"), data)
+            except (OSError, ValueError):
+                pass
+            logging.info("Stopped receiving blocker daemon events")
+
+        threading.Thread(target=receive, name="blocker-events", daemon=True).start()
+
+        def stop() -> None:
+            connection.shutdown(socket.SHUT_RDWR)
+            connection.close()
+        return stop
+
+
+def connect(socket_path: str, manager_factory: Callable[[], BlockingManager]):
+    """Return a client of the daemon on socket_path, starting one in this process if none is running
+
+    Where Unix sockets are not available, the manager is used directly."""
+    if not hasattr(socket, "AF_UNIX"):
+        return manager_factory()
+    client = BlockerClient(socket_path)
+    if not client.is_running():
+        BlockerDaemon(manager_factory(), socket_path).start()
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless website blocker.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix socket of the daemon")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Run the daemon")
+    serve.add_argument("--hosts", help="Hosts file to manage, default is the system's")
+    serve.add_argument("--journal", default="block_journal.jsonl", help="Journal of the active blocks")
+    block = commands.add_parser("block", help="Block websites")
+    block.add_argument("--duration", type=int, required=True, help="Duration in minutes")
+    block.add_argument("websites", nargs="+")
+    unblock = commands.add_parser("unblock", help="Unblock websites")
+    unblock.add_argument("--include-outside", action="store_true",
+                         help="Also remove the websites from entries outside the blocker's section")
+    unblock.add_argument("websites", nargs="+")
+    import_parser = commands.add_parser("import", help="Block the websites of a blocklist file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--duration", type=int, required=True, help="Duration in minutes")
+    import_parser.add_argument("--variants", action="store_true", help="Also block www. and m. variants")
+    commands.add_parser("list", help="List the active blocks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        if args.command == "serve":
+            if BlockerClient(args.socket).is_running():
+                raise BlockerException(f"A blocker daemon is already listening on {args.socket}")
+            manager = BlockingManager(HostsFileManager(args.hosts), journal=BlockJournal(args.journal))
+            daemon = BlockerDaemon(manager, args.socket)
+            # serve_forever() returns once shutdown() is called from another thread
+            signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=daemon.shutdown).start())
+            try:
+                daemon.serve_forever()
+            finally:
+                manager.flush(timeout=10)
+            return 0
+        client = BlockerClient(args.socket)
+        if args.command == "block":
+            result = client.block(args.websites, args.duration * 60)
+        elif args.command == "unblock":
+            result = client.unblock(args.websites, args.include_outside)
+        elif args.command == "import":
+            result = client.import_blocklist(args.path, args.duration * 60, args.variants)
+        else:
+            result = client.list_blocks()
+        print(json.dumps(result, indent=4))
+        return 0
+    except BlockerException as e:
+        logging.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -489,6 +489,12 @@ def main():
     g_how.add_argument('--commit-mode', action='store_true', help=SUPPRESS)
     g_how.add_argument('--request-timeout', metavar='N', type=float, default=300.0,
                        help='Seconds to wait before timing out a connection request. Defaults to 300.')
+    g_how.add_argument('--media-pool-size', metavar='N', type=int, default=10,
+                       help='Number of keep-alive connections per host kept open for downloading pictures and '
+                            'videos. Defaults to 10.')
+    g_how.add_argument('--media-concurrency', metavar='N', type=int, default=8,
+                       help='Number of pictures and videos of a post that are downloaded at the same time. '
+                            'Defaults to 8.')
     g_how.add_argument('--abort-on', type=http_status_code_list, metavar="STATUS_CODES",
                        help='Comma-separated list of HTTP status codes that cause Instaloader to abort, bypassing all '
                             'retry logic.')
@@ -559,7 +565,9 @@ def main():
                              fatal_status_codes=args.abort_on,
                              iphone_support=not args.no_iphone,
                              title_pattern=args.title_pattern,
-                             sanitize_paths=args.sanitize_paths)
+                             sanitize_paths=args.sanitize_paths,
+                             media_pool_size=args.media_pool_size,
+                             media_concurrency=args.media_concurrency)
         exit_code = _main(loader,
                           args.profile,
                           username=args.login.lower() if args.login is not None else None,
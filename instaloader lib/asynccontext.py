@@ -0,0 +1,537 @@
+import asyncio
+import json
+import os
+import random
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Mapping, Optional
+
+import requests
+import requests.structures
+
+from .exceptions import *
+from .instaloadercontext import InstaloaderContext, RateController
+
+
+class AsyncResponse(ABC):
+    """Response returned by an :class:`AsyncHTTPBackend`. Its body is read with :meth:`read`, :meth:`json` or
+    :meth:`iter_chunks`; a response that is not read completely has to be closed.
+
+    .. versionadded:: 4.14"""
+
+    def __init__(self, status_code: int, reason: str, url: str, headers: Mapping[str, str]):
+        self.status_code = status_code
+        self.reason = reason
+        self.url = url
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+
+    @property
+    def is_redirect(self) -> bool:
+        return 'location' in self.headers and self.status_code in (301, 302, 303, 307, 308)
+
+    @abstractmethod
+    async def read(self) -> bytes:
+        """The whole body."""
+
+    @abstractmethod
+    def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        """Iterate over the body in chunks of up to chunk_size bytes."""
+
+    async def json(self) -> Any:
+        return json.loads(await self.read())
+
+    async def close(self) -> None:
+        pass
+
+
+class AsyncHTTPBackend(ABC):
+    """HTTP client that :class:`AsyncInstaloaderContext` sends its requests with.
+
+    A backend is created for a :class:`requests.Session`, whose headers and cookies it starts with. It keeps the
+    cookies that responses set. Headers passed to :meth:`request` are sent on top of the session's; a header set to
+    None is not sent, and an explicit ``Cookie`` header replaces the session's cookies.
+
+    .. versionadded:: 4.14"""
+
+    @property
+    @abstractmethod
+    def headers(self) -> Mapping[str, str]:
+        """Headers sent with every request."""
+
+    @abstractmethod
+    def cookies(self) -> Dict[str, str]:
+        """Cookies sent with every request."""
+
+    @abstractmethod
+    async def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                      data: Optional[Dict[str, Any]] = None, headers: Optional[Mapping[str, Optional[str]]] = None,
+                      allow_redirects: bool = False) -> AsyncResponse:
+        """Send a request and return the response once its headers are received.
+
+        :raises ConnectionException: When the request failed."""
+
+    async def close(self) -> None:
+        pass
+
+
+class _RequestsResponse(AsyncResponse):
+    def __init__(self, resp: requests.Response, run: Callable):
+        super().__init__(resp.status_code, resp.reason, resp.url, resp.headers)
+        self._resp = resp
+        self._run = run
+
+    async def read(self) -> bytes:
+        try:
+            return await self._run(lambda: self._resp.content)
+        except requests.exceptions.RequestException as err:
+            raise ConnectionException(str(err)) from err
+
+    async def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:  # type: ignore
+        chunks = self._resp.iter_content(chunk_size)
+        while True:
+            try:
+                chunk = await self._run(next, chunks, None)
+            except requests.exceptions.RequestException as err:
+                raise ConnectionException(str(err)) from err
+            if chunk is None:
+                return
+            yield chunk
+
+    async def close(self) -> None:
+        self._resp.close()
+
+
+class ThreadedRequestsBackend(AsyncHTTPBackend):
+    """Sends the requests with the given :class:`requests.Session` itself, each on one of ``max_workers`` threads.
+
+    It needs nothing beyond requests and shares the session's cookies and connections with synchronous code, but
+    every request in flight occupies a thread.
+
+    .. versionadded:: 4.14"""
+
+    def __init__(self, session: requests.Session, timeout: Optional[float] = None, max_workers: int = 32):
+        self._session = session
+        self._timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='instaloader-async')
+
+    @property
+    def headers(self) -> Mapping[str, str]:
+        return self._session.headers
+
+    def cookies(self) -> Dict[str, str]:
+        return self._session.cookies.get_dict()
+
+    async def _run(self, function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                      data: Optional[Dict[str, Any]] = None, headers: Optional[Mapping[str, Optional[str]]] = None,
+                      allow_redirects: bool = False) -> AsyncResponse:
+        try:
+            resp = await self._run(partial(self._session.request, method, url, params=params, data=data,
+                                           headers=headers, allow_redirects=allow_redirects, stream=True,
+                                           timeout=self._timeout))
+        except requests.exceptions.RequestException as err:
+            raise ConnectionException(str(err)) from err
+        return _RequestsResponse(resp, self._run)
+
+    async def close(self) -> None:
+        # The session belongs to the InstaloaderContext and stays open
+        self._executor.shutdown(wait=False)
+
+
+class _AiohttpResponse(AsyncResponse):
+    def __init__(self, resp, errors: tuple):
+        super().__init__(resp.status, resp.reason or '', str(resp.url), resp.headers)
+        self._resp = resp
+        self._errors = errors
+
+    async def read(self) -> bytes:
+        try:
+            return await self._resp.read()
+        except self._errors as err:
+            raise ConnectionException(str(err) or type(err).__name__) from err
+
+    async def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:  # type: ignore
+        try:
+            async for chunk in self._resp.content.iter_chunked(chunk_size):
+                yield chunk
+        except self._errors as err:
+            raise ConnectionException(str(err) or type(err).__name__) from err
+
+    async def close(self) -> None:
+        self._resp.release()
+
+
+class AiohttpBackend(AsyncHTTPBackend):
+    """Sends the requests with `aiohttp <https://docs.aiohttp.org/>`__, which has to be installed.
+
+    It copies the headers and cookies of the given :class:`requests.Session` and keeps up to ``limit`` connections
+    open, so that hundreds of requests can be in flight within one thread.
+
+    .. versionadded:: 4.14"""
+
+    def __init__(self, session: requests.Session, timeout: Optional[float] = None, limit: int = 100):
+        try:
+            # pylint:disable=import-outside-toplevel
+            import aiohttp  # type: ignore
+        except ImportError as err:
+            raise InvalidArgumentException("aiohttp library is needed for AiohttpBackend") from err
+        self._aiohttp = aiohttp
+        self._headers = requests.structures.CaseInsensitiveDict(session.headers)
+        self._cookies = session.cookies.get_dict()
+        self._timeout = timeout
+        self._limit = limit
+        self._client = None
+        self._errors = (aiohttp.ClientError, asyncio.TimeoutError)
+
+    @property
+    def headers(self) -> Mapping[str, str]:
+        return self._headers
+
+    def cookies(self) -> Dict[str, str]:
+        return dict(self._cookies)
+
+    def _client_session(self):
+        # aiohttp sessions have to be created within the event loop they are used in
+        if self._client is None:
+            aiohttp = self._aiohttp
+            # Cookies are kept by the backend, as explicit Cookie headers have to replace them
+            self._client = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._limit),
+                                                 timeout=aiohttp.ClientTimeout(total=None,
+                                                                               sock_connect=self._timeout,
+                                                                               sock_read=self._timeout),
+                                                 cookie_jar=aiohttp.DummyCookieJar())
+        return self._client
+
+    async def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                      data: Optional[Dict[str, Any]] = None, headers: Optional[Mapping[str, Optional[str]]] = None,
+                      allow_redirects: bool = False) -> AsyncResponse:
+        merged_headers = requests.structures.CaseInsensitiveDict(self._headers)
+        merged_headers.update(headers or {})
+        if 'Cookie' not in merged_headers and self._cookies:
+            merged_headers['Cookie'] = '; '.join('{}={}'.format(name, value) for name, value in self._cookies.items())
+        try:
+            resp = await self._client_session().request(
+                method, url,
+                # Like requests, leave out parameters that are None and send the others as strings
+                params={key: str(value) for key, value in params.items() if value is not None} if params else None,
+                data=data, allow_redirects=allow_redirects,
+                headers={name: value for name, value in merged_headers.items() if value is not None})
+        except self._errors as err:
+            raise ConnectionException(str(err) or type(err).__name__) from err
+        for response in (*resp.history, resp):
+            self._cookies.update((name, morsel.value) for name, morsel in response.cookies.items())
+        return _AiohttpResponse(resp, self._errors)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class AsyncRateController(RateController):
+    """Awaitable :class:`RateController` of an :class:`AsyncInstaloaderContext`.
+
+    :meth:`wait_before_query`, :meth:`handle_429` and :meth:`sleep` are coroutines. Concurrent queries take turns in
+    waiting, so that they stay within the same limits as consecutive queries.
+
+    .. versionadded:: 4.14"""
+
+    def __init__(self, context: 'AsyncInstaloaderContext'):
+        super().__init__(context)  # type: ignore
+        self._turn: Optional[asyncio.Lock] = None
+
+    def _turn_lock(self) -> asyncio.Lock:
+        if self._turn is None:
+            self._turn = asyncio.Lock()
+        return self._turn
+
+    async def sleep(self, secs: float):  # type: ignore
+        """Wait given number of seconds."""
+        await asyncio.sleep(secs)
+
+    async def wait_before_query(self, query_type: str) -> None:  # type: ignore
+        """Called before a query to Instagram, like :meth:`RateController.wait_before_query`."""
+        async with self._turn_lock():
+            waittime = self._waittime_before_query(query_type)
+            if waittime > 0:
+                await self.sleep(waittime)
+            self._track_query(query_type)
+
+    async def handle_429(self, query_type: str) -> None:  # type: ignore
+        """Called to handle a 429 Too Many Requests response, like :meth:`RateController.handle_429`."""
+        async with self._turn_lock():
+            waittime = self._waittime_after_429(query_type)
+            if waittime > 0:
+                await self.sleep(waittime)
+
+
+class AsyncInstaloaderContext:
+    """Coroutine versions of the query and download routines of an :class:`InstaloaderContext`.
+
+    It sends the requests of the given context's session, with its cookies, headers and login, through an
+    :class:`AsyncHTTPBackend`, so that one event loop can run many queries and downloads at the same time. Logging
+    and the iPhone headers are shared with the context, so it should be created after logging in::
+
+       L = instaloader.Instaloader()
+       L.load_session_from_file(USER)
+
+       async def main():
+           async with instaloader.AsyncInstaloaderContext(L.context) as context:
+               data = await context.graphql_query(query_hash, variables)
+               await asyncio.gather(*(context.get_and_write_raw(url, name) for url, name in files))
+
+    Its queries are rate controlled separately from those of the context.
+
+    :param context: Context whose session, configuration and log to use.
+    :param backend: Creates the backend of a :class:`requests.Session` and request timeout, default is
+       :class:`ThreadedRequestsBackend`. :class:`AiohttpBackend` can run hundreds of requests concurrently.
+    :param rate_controller: Generator for an :class:`AsyncRateController` to override rate controlling behavior
+
+    .. versionadded:: 4.14"""
+
+    def __init__(self, context: InstaloaderContext,
+                 backend: Optional[Callable[[requests.Session, float], AsyncHTTPBackend]] = None,
+                 rate_controller: Optional[Callable[["AsyncInstaloaderContext"], AsyncRateController]] = None):
+        self.context = context
+        backend = backend if backend is not None else ThreadedRequestsBackend
+        self._session = backend(context._session, context.request_timeout)
+        self._media_session = backend(context.get_media_session(), context.request_timeout)
+        self._rate_controller = rate_controller(self) if rate_controller is not None else AsyncRateController(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """Close the backends; the context and its session stay open."""
+        await self._session.close()
+        await self._media_session.close()
+
+    @property
+    def username(self) -> Optional[str]:
+        return self.context.username
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.context.user_id
+
+    @property
+    def is_logged_in(self) -> bool:
+        return self.context.is_logged_in
+
+    def log(self, *msg, sep='', end='\n', flush=False):
+        self.context.log(*msg, sep=sep, end=end, flush=flush)
+
+    def error(self, msg, repeat_at_end=True):
+        self.context.error(msg, repeat_at_end)
+
+    async def do_sleep(self):
+        """Sleep a short time if the context's sleep is set. Awaited before each request to instagram.com."""
+        if self.context.sleep:
+            await asyncio.sleep(min(random.expovariate(0.6), 15.0))
+
+    @staticmethod
+    async def _response_error(resp: AsyncResponse) -> str:
+        extra_from_json: Optional[str] = None
+        try:
+            resp_json = await resp.json()
+            if "status" in resp_json:
+                extra_from_json = (
+                    f"\"{resp_json['status']}\" status, message \"{resp_json['message']}\""
+                    if "message" in resp_json
+                    else f"\"{resp_json['status']}\" status"
+                )
+        except (ConnectionException, ValueError, TypeError):
+            pass
+        return (
+            f"{resp.status_code} {resp.reason}"
+            f"{f' - {extra_from_json}' if extra_from_json is not None else ''}"
+            f" when accessing {resp.url}"
+        )
+
+    async def get_json(self, path: str, params: Dict[str, Any], host: str = 'www.instagram.com', _attempt=1,
+                       response_headers: Optional[Dict[str, Any]] = None, use_post: bool = False,
+                       headers: Optional[Mapping[str, Optional[str]]] = None) -> Dict[str, Any]:
+        """JSON request to Instagram, like :meth:`InstaloaderContext.get_json`.
+
+        :raises QueryReturnedBadRequestException: When the server responds with a 400.
+        :raises QueryReturnedNotFoundException: When the server responds with a 404.
+        :raises ConnectionException: When query repeatedly failed."""
+        is_graphql_query = 'query_hash' in params and 'graphql/query' in path
+        is_doc_id_query = 'doc_id' in params and 'graphql/query' in path
+        is_iphone_query = host == 'i.instagram.com'
+        is_other_query = not is_graphql_query and not is_doc_id_query and host == "www.instagram.com"
+        try:
+            await self.do_sleep()
+            if is_graphql_query:
+                await self._rate_controller.wait_before_query(params['query_hash'])
+            if is_doc_id_query:
+                await self._rate_controller.wait_before_query(params['doc_id'])
+            if is_iphone_query:
+                await self._rate_controller.wait_before_query('iphone')
+            if is_other_query:
+                await self._rate_controller.wait_before_query('other')
+            if use_post:
+                resp = await self._session.request('POST', 'https://{0}/{1}'.format(host, path), data=params,
+                                                   headers=headers)
+            else:
+                resp = await self._session.request('GET', 'https://{0}/{1}'.format(host, path), params=params,
+                                                   headers=headers)
+            try:
+                if resp.status_code in self.context.fatal_status_codes:
+                    redirect = " redirect to {}".format(resp.headers['location']) if 'location' in resp.headers else ""
+                    body = ""
+                    if resp.headers.get('Content-Type', '').startswith('application/json'):
+                        text = (await resp.read()).decode(errors='replace')
+                        body = ': ' + text[:500] + ('…' if len(text) > 501 else '')
+                    raise AbortDownloadException("Query to https://{}/{} responded with \"{} {}\"{}{}".format(
+                        host, path, resp.status_code, resp.reason, redirect, body
+                    ))
+                while resp.is_redirect:
+                    redirect_url = resp.headers['location']
+                    self.log('\nHTTP redirect from https://{0}/{1} to {2}'.format(host, path, redirect_url))
+                    if (redirect_url.startswith('https://www.instagram.com/accounts/login') or
+                        redirect_url.startswith('https://i.instagram.com/accounts/login')):
+                        if not self.is_logged_in:
+                            raise LoginRequiredException("Redirected to login page. Use --login or --load-cookies.")
+                        raise AbortDownloadException("Redirected to login page. You've been logged out, please wait " +
+                                                     "some time, recreate the session and try again")
+                    if redirect_url.startswith('https://{}/'.format(host)):
+                        await resp.close()
+                        resp = await self._session.request(
+                            'GET', redirect_url if redirect_url.endswith('/') else redirect_url + '/',
+                            params=params, headers=headers)
+                    else:
+                        break
+                if response_headers is not None:
+                    response_headers.clear()
+                    response_headers.update(resp.headers)
+                if resp.status_code == 400:
+                    raise QueryReturnedBadRequestException(await self._response_error(resp))
+                if resp.status_code == 404:
+                    raise QueryReturnedNotFoundException(await self._response_error(resp))
+                if resp.status_code == 429:
+                    raise TooManyRequestsException(await self._response_error(resp))
+                if resp.status_code != 200:
+                    raise ConnectionException(await self._response_error(resp))
+                else:
+                    resp_json = await resp.json()
+                if 'status' in resp_json and resp_json['status'] != "ok":
+                    raise ConnectionException(await self._response_error(resp))
+                return resp_json
+            finally:
+                await resp.close()
+        except (ConnectionException, json.decoder.JSONDecodeError) as err:
+            error_string = "JSON Query to {}: {}".format(path, err)
+            if _attempt == self.context.max_connection_attempts:
+                if isinstance(err, QueryReturnedNotFoundException):
+                    raise QueryReturnedNotFoundException(error_string) from err
+                else:
+                    raise ConnectionException(error_string) from err
+            self.error(error_string + " [retrying]", repeat_at_end=False)
+            if isinstance(err, TooManyRequestsException):
+                if is_graphql_query:
+                    await self._rate_controller.handle_429(params['query_hash'])
+                if is_doc_id_query:
+                    await self._rate_controller.handle_429(params['doc_id'])
+                if is_iphone_query:
+                    await self._rate_controller.handle_429('iphone')
+                if is_other_query:
+                    await self._rate_controller.handle_429('other')
+            return await self.get_json(path=path, params=params, host=host, _attempt=_attempt + 1,
+                                       response_headers=response_headers, use_post=use_post, headers=headers)
+
+    async def graphql_query(self, query_hash: str, variables: Dict[str, Any],
+                            referer: Optional[str] = None, rhx_gis: Optional[str] = None) -> Dict[str, Any]:
+        """Do a GraphQL Query, like :meth:`InstaloaderContext.graphql_query`."""
+        variables_json = json.dumps(variables, separators=(',', ':'))
+        resp_json = await self.get_json('graphql/query',
+                                        params={'query_hash': query_hash,
+                                                'variables': variables_json},
+                                        headers=self.context._graphql_query_headers(variables_json, referer, rhx_gis))
+        if 'status' not in resp_json:
+            self.error("GraphQL response did not contain a \"status\" field.")
+        return resp_json
+
+    async def doc_id_graphql_query(self, doc_id: str, variables: Dict[str, Any],
+                                   referer: Optional[str] = None) -> Dict[str, Any]:
+        """Do a doc_id-based GraphQL Query using method POST, like :meth:`InstaloaderContext.doc_id_graphql_query`."""
+        variables_json = json.dumps(variables, separators=(',', ':'))
+        resp_json = await self.get_json('graphql/query',
+                                        params={'variables': variables_json,
+                                                'doc_id': doc_id,
+                                                'server_timestamps': 'true'},
+                                        headers=self.context._graphql_query_headers(variables_json, referer),
+                                        use_post=True)
+        if 'status' not in resp_json:
+            self.error("GraphQL response did not contain a \"status\" field.")
+        return resp_json
+
+    async def get_iphone_json(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON request to ``i.instagram.com``, like :meth:`InstaloaderContext.get_iphone_json`."""
+        headers = self.context._iphone_http_header(self._session.cookies(), self._session.headers)
+        response_headers = dict()    # type: Dict[str, Any]
+        response = await self.get_json(path, params, 'i.instagram.com', response_headers=response_headers,
+                                       headers=headers)
+        self.context._update_iphone_headers(response_headers)
+        return response
+
+    async def get_raw(self, url: str) -> AsyncResponse:
+        """Request a file anonymously. The returned response has to be read or closed.
+
+        :raises QueryReturnedNotFoundException: When the server responds with a 404.
+        :raises QueryReturnedForbiddenException: When the server responds with a 403.
+        :raises ConnectionException: When download failed."""
+        resp = await self._media_session.request('GET', url, allow_redirects=True)
+        if resp.status_code == 200:
+            return resp
+        try:
+            if resp.status_code == 403:
+                # suspected invalid URL signature
+                raise QueryReturnedForbiddenException(await self._response_error(resp))
+            if resp.status_code == 404:
+                # 404 not worth retrying.
+                raise QueryReturnedNotFoundException(await self._response_error(resp))
+            raise ConnectionException(await self._response_error(resp))
+        finally:
+            await resp.close()
+
+    async def write_raw(self, resp: AsyncResponse, filename: str) -> None:
+        """Write the body of a response into a file, via a ``.temp`` file that replaces it once complete. Like
+        :meth:`InstaloaderContext.write_raw`, it continues a partial download of the same file if the server
+        supports range requests."""
+        self.log(filename, end=' ', flush=True)
+        try:
+            validators, offset = self.context._partial_download(filename, resp.headers)
+            if offset:
+                ranged = await self._media_session.request('GET', resp.url, allow_redirects=True,
+                                                           headers=self.context._range_headers(offset, validators))
+                if self.context._is_continuation(ranged.status_code, ranged.headers, offset, validators):
+                    resp, ranged = ranged, resp
+                else:
+                    offset = 0
+                await ranged.close()
+            with open(filename + '.temp', 'ab' if offset else 'wb') as file:
+                async for chunk in resp.iter_chunks(64 * 1024):
+                    file.write(chunk)
+                size = file.tell()
+        finally:
+            await resp.close()
+        self.context._check_download_complete(filename, validators, size)
+        os.replace(filename + '.temp', filename)
+        with suppress(FileNotFoundError):
+            os.remove(filename + '.temp.meta')
+
+    async def get_and_write_raw(self, url: str, filename: str) -> None:
+        """Download a file anonymously and write it to filename.
+
+        :raises QueryReturnedNotFoundException: When the server responds with a 404.
+        :raises QueryReturnedForbiddenException: When the server responds with a 403.
+        :raises ConnectionException: When download failed."""
+        await self.write_raw(await self.get_raw(url), filename)
@@ -7,6 +7,8 @@ import shutil
 import string
 import sys
 import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from contextlib import contextmanager, suppress
 from datetime import datetime, timezone
 from functools import wraps
@@ -172,6 +174,27 @@ class _PostPathFormatter(_ArbitraryItemFormatter):
         return ret
 
 
+class _MediaFetchEngine:
+    """Runs the picture and video downloads of :meth:`Instaloader.download_post` and
+    :meth:`Instaloader.download_storyitem` on a pool of ``limit`` threads.
+
+    Only the files are fetched on the pool. Their URLs are looked up by the caller beforehand, as that may query the
+    Instagram API and change the structure the caller saves the metadata of."""
+
+    def __init__(self, loader: 'Instaloader', limit: int):
+        self._loader = loader
+        self._executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix='instaloader-media')
+
+    def download_pic(self, filename: str, url: str, mtime: datetime,
+                     filename_suffix: Optional[str] = None) -> 'Future[bool]':
+        """Submit :meth:`Instaloader.download_pic`."""
+        return self._executor.submit(self._loader.download_pic, filename=filename, url=url, mtime=mtime,
+                                     filename_suffix=filename_suffix)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+
 class Instaloader:
     """Instaloader Class.
 
@@ -202,6 +225,8 @@ class Instaloader:
     :param fatal_status_codes: :option:`--abort-on`
     :param iphone_support: not :option:`--no-iphone`
     :param sanitize_paths: :option:`--sanitize-paths`
+    :param media_pool_size: :option:`--media-pool-size`
+    :param media_concurrency: :option:`--media-concurrency`, pictures and videos of a post downloaded at a time
 
     .. attribute:: context
 
@@ -232,11 +257,13 @@ class Instaloader:
                  fatal_status_codes: Optional[List[int]] = None,
                  iphone_support: bool = True,
                  title_pattern: Optional[str] = None,
-                 sanitize_paths: bool = False):
+                 sanitize_paths: bool = False,
+                 media_pool_size: int = 10,
+                 media_concurrency: int = 8):
 
         self.context = InstaloaderContext(sleep, quiet, user_agent, max_connection_attempts,
                                           request_timeout, rate_controller, fatal_status_codes,
-                                          iphone_support)
+                                          iphone_support, media_pool_size)
 
         # configuration parameters
         self.dirname_pattern = dirname_pattern or "{target}"
@@ -263,6 +290,9 @@ class Instaloader:
             else storyitem_metadata_txt_pattern
         self.resume_prefix = resume_prefix
         self.check_resume_bbd = check_resume_bbd
+        self.media_concurrency = media_concurrency
+        self._media_engine: Optional[_MediaFetchEngine] = None
+        self._media_engine_lock = threading.Lock()
 
         self.slide = slide or ""
         self.slide_start = 0
@@ -314,7 +344,9 @@ class Instaloader:
             slide=self.slide,
             fatal_status_codes=self.context.fatal_status_codes,
             iphone_support=self.context.iphone_support,
-            sanitize_paths=self.sanitize_paths)
+            sanitize_paths=self.sanitize_paths,
+            media_pool_size=self.context.media_pool_size,
+            media_concurrency=self.media_concurrency)
         yield new_loader
         self.context.error_log.extend(new_loader.context.error_log)
         new_loader.context.error_log = []  # avoid double-printing of errors
@@ -322,8 +354,18 @@ class Instaloader:
 
     def close(self):
         """Close associated session objects and repeat error log."""
+        with self._media_engine_lock:
+            if self._media_engine is not None:
+                self._media_engine.close()
+                self._media_engine = None
         self.context.close()
 
+    def _media_fetch_engine(self) -> _MediaFetchEngine:
+        with self._media_engine_lock:
+            if self._media_engine is None:
+                self._media_engine = _MediaFetchEngine(self, self.media_concurrency)
+            return self._media_engine
+
     def __enter__(self):
         return self
 
@@ -352,6 +394,7 @@ class Instaloader:
             filename = nominal_filename
         if filename != nominal_filename and os.path.isfile(filename):
             self.context.log(filename + ' exists', end=' ', flush=True)
+            resp.close()
             return False
         self.context.write_raw(resp, filename)
         os.utime(filename, (datetime.now().timestamp(), mtime.timestamp()))
@@ -719,6 +762,13 @@ class Instaloader:
         filename_template = os.path.join(dirname, self.format_filename(post, target=target))
         filename = self.__prepare_filename(filename_template, lambda: post.url)
 
+        # Pictures and videos are downloaded concurrently; their results are collected at the end
+        media = self._media_fetch_engine()
+        sidecar_downloads: List['Future[bool]'] = []
+        picture_download: Optional['Future[bool]'] = None
+        thumbnail_download: Optional['Future[bool]'] = None
+        video_download: Optional['Future[bool]'] = None
+
         # Download the image(s) / video thumbnail and videos within sidecars if desired
         downloaded = True
         if post.typename == 'GraphSidecar':
@@ -742,28 +792,35 @@ class Instaloader:
                             sidecar_filename = self.__prepare_filename(filename_template,
                                                                        lambda: sidecar_node.display_url)
                             # Download sidecar picture or video thumbnail (--no-pictures implies --no-video-thumbnails)
-                            downloaded &= self.download_pic(filename=sidecar_filename, url=sidecar_node.display_url,
-                                                            mtime=post.date_local, filename_suffix=suffix)
+                            sidecar_downloads.append(media.download_pic(filename=sidecar_filename,
+                                                                        url=sidecar_node.display_url,
+                                                                        mtime=post.date_local, filename_suffix=suffix))
                         if sidecar_node.is_video and self.download_videos:
+                            video_url = sidecar_node.video_url
                             # pylint:disable=cell-var-from-loop
-                            sidecar_filename = self.__prepare_filename(filename_template,
-                                                                       lambda: sidecar_node.video_url)
+                            sidecar_filename = self.__prepare_filename(filename_template, lambda: video_url)
                             # Download sidecar video if desired
-                            downloaded &= self.download_pic(filename=sidecar_filename, url=sidecar_node.video_url,
-                                                            mtime=post.date_local, filename_suffix=suffix)
+                            sidecar_downloads.append(media.download_pic(filename=sidecar_filename,
+                                                                        url=video_url,
+                                                                        mtime=post.date_local, filename_suffix=suffix))
                 else:
                     downloaded = False
         elif post.typename == 'GraphImage':
             # Download picture
             if self.download_pictures:
-                downloaded = (not _already_downloaded(filename + ".jpg") and
-                              self.download_pic(filename=filename, url=post.url, mtime=post.date_local))
+                if _already_downloaded(filename + ".jpg"):
+                    downloaded = False
+                else:
+                    picture_download = media.download_pic(filename=filename, url=post.url, mtime=post.date_local)
         elif post.typename == 'GraphVideo':
             # Download video thumbnail (--no-pictures implies --no-video-thumbnails)
             if self.download_pictures and self.download_video_thumbnails:
                 with self.context.error_catcher("Video thumbnail of {}".format(post)):
-                    downloaded = (not _already_downloaded(filename + ".jpg") and
-                                  self.download_pic(filename=filename, url=post.url, mtime=post.date_local))
+                    if _already_downloaded(filename + ".jpg"):
+                        downloaded = False
+                    else:
+                        thumbnail_download = media.download_pic(filename=filename, url=post.url,
+                                                                mtime=post.date_local)
         else:
             self.context.error("Warning: {0} has unknown typename: {1}".format(post, post.typename))
 
@@ -772,10 +829,13 @@ class Instaloader:
         if metadata_string:
             self.save_caption(filename=filename, mtime=post.date_local, caption=metadata_string)
 
-        # Download video if desired
+        # Download video if desired; its URL is looked up here, as that may query the API and update post
+        video_downloaded = True
         if post.is_video and self.download_videos:
-            downloaded &= (not _already_downloaded(filename + ".mp4") and
-                           self.download_pic(filename=filename, url=post.video_url, mtime=post.date_local))
+            if _already_downloaded(filename + ".mp4"):
+                video_downloaded = False
+            else:
+                video_download = media.download_pic(filename=filename, url=post.video_url, mtime=post.date_local)
 
         # Download geotags if desired
         if self.download_geotags and post.location:
@@ -789,6 +849,20 @@ class Instaloader:
         if self.save_metadata:
             self.save_metadata_json(filename, post)
 
+        # Wait for the downloads, then raise their errors in the order the sequential downloads did
+        wait([download for download in sidecar_downloads + [picture_download, thumbnail_download, video_download]
+              if download is not None])
+        for sidecar_download in sidecar_downloads:
+            downloaded &= sidecar_download.result()
+        if picture_download is not None:
+            downloaded = picture_download.result()
+        if thumbnail_download is not None:
+            with self.context.error_catcher("Video thumbnail of {}".format(post)):
+                downloaded = thumbnail_download.result()
+        if video_download is not None:
+            video_downloaded = video_download.result()
+        downloaded &= video_downloaded
+
         self.context.log()
         return downloaded
 
@@ -900,19 +974,23 @@ class Instaloader:
         dirname = _PostPathFormatter(item, self.sanitize_paths).format(self.dirname_pattern, target=target)
         filename_template = os.path.join(dirname, self.format_filename(item, target=target))
         filename = self.__prepare_filename(filename_template, lambda: item.url)
+        media = self._media_fetch_engine()
+        video_download: Optional['Future[bool]'] = None
+        picture_download: Optional['Future[bool]'] = None
         downloaded = False
         video_url_fetch_failed = False
         if item.is_video and self.download_videos is True:
             video_url = item.video_url
             if video_url:
                 filename = self.__prepare_filename(filename_template, lambda: str(video_url))
-                downloaded |= (not _already_downloaded(filename + ".mp4") and
-                               self.download_pic(filename=filename, url=video_url, mtime=date_local))
+                if not _already_downloaded(filename + ".mp4"):
+                    video_download = media.download_pic(filename=filename, url=video_url, mtime=date_local)
             else:
                 video_url_fetch_failed = True
-        if video_url_fetch_failed or not item.is_video or self.download_video_thumbnails is True:
-            downloaded = (not _already_downloaded(filename + ".jpg") and
-                          self.download_pic(filename=filename, url=item.url, mtime=date_local))
+        download_picture = video_url_fetch_failed or not item.is_video or self.download_video_thumbnails is True
+        if download_picture:
+            if not _already_downloaded(filename + ".jpg"):
+                picture_download = media.download_pic(filename=filename, url=item.url, mtime=date_local)
         # Save caption if desired
         metadata_string = _ArbitraryItemFormatter(item).format(self.storyitem_metadata_txt_pattern).strip()
         if metadata_string:
@@ -920,6 +998,12 @@ class Instaloader:
         # Save metadata as JSON if desired.
         if self.save_metadata is not False:
             self.save_metadata_json(filename, item)
+        # Wait for the downloads; the picture's result replaces the video's, as when they ran one after another
+        wait([download for download in (video_download, picture_download) if download is not None])
+        if video_download is not None:
+            downloaded = video_download.result()
+        if download_picture:
+            downloaded = picture_download.result() if picture_download is not None else False
         self.context.log()
         return downloaded
 
@@ -6,15 +6,18 @@ import random
 import shutil
 import sys
 import textwrap
+import threading
 import time
 import urllib.parse
 import uuid
 from contextlib import contextmanager, suppress
 from datetime import datetime, timedelta
 from functools import partial
-from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
 import requests
+import requests.adapters
+import requests.structures
 import requests.utils
 
 from .exceptions import *
@@ -83,7 +86,7 @@ class InstaloaderContext:
                  max_connection_attempts: int = 3, request_timeout: float = 300.0,
                  rate_controller: Optional[Callable[["InstaloaderContext"], "RateController"]] = None,
                  fatal_status_codes: Optional[List[int]] = None,
-                 iphone_support: bool = True):
+                 iphone_support: bool = True, media_pool_size: int = 10):
 
         self.user_agent = user_agent if user_agent is not None else default_user_agent()
         self.request_timeout = request_timeout
@@ -99,10 +102,21 @@ class InstaloaderContext:
         self.iphone_support = iphone_support
         self.iphone_headers = default_iphone_headers()
 
+        # Headers sent along with GraphQL queries, on top of and overriding those of the session; None removes one
+        self._graphql_headers = self._graphql_http_header()
+
+        # Anonymous keep-alive session shared by get_raw() and head(), created by get_media_session()
+        self.media_pool_size = media_pool_size
+        self._media_session: Optional[requests.Session] = None
+        self._media_session_lock = threading.RLock()
+        self._media_stats = {'requests': 0, 'connections': 0, 'resumed': 0, 'resumed_bytes': 0}
+
         # error log, filled with error() and printed at the end of Instaloader.main()
         self.error_log: List[str] = []
 
         self._rate_controller = rate_controller(self) if rate_controller is not None else RateController(self)
+        # Queries may be made from the threads of Instaloader's media downloads, too
+        self._rate_controller_lock = threading.Lock()
 
         # Can be set to True for testing, disables supression of InstaloaderContext._error_catcher
         self.raise_all_errors = False
@@ -160,11 +174,18 @@ class InstaloaderContext:
 
     def close(self):
         """Print error log and close session"""
+        if self._media_stats['resumed']:
+            self.log("Resumed {} interrupted downloads, {} bytes did not have to be downloaded again."
+                     .format(self._media_stats['resumed'], self._media_stats['resumed_bytes']))
         if self.error_log and not self.quiet:
             print("\nErrors or warnings occurred:", file=sys.stderr)
             for err in self.error_log:
                 print(err, file=sys.stderr)
         self._session.close()
+        with self._media_session_lock:
+            if self._media_session is not None:
+                self._media_session.close()
+                self._media_session = None
 
     @contextmanager
     def error_catcher(self, extra_info: Optional[str] = None):
@@ -201,6 +222,13 @@ class InstaloaderContext:
             del header['X-Requested-With']
         return header
 
+    def _graphql_http_header(self) -> Dict[str, Optional[str]]:
+        """Returns the per-request header template of GraphQL queries."""
+        header: Dict[str, Optional[str]] = dict(self._default_http_header(empty_session_only=True))
+        header.update({'Connection': None, 'Content-Length': None,
+                       'authority': 'www.instagram.com', 'scheme': 'https', 'accept': '*/*'})
+        return header
+
     def get_anonymous_session(self) -> requests.Session:
         """Returns our default anonymous requests.Session object."""
         session = requests.Session()
@@ -213,6 +241,55 @@ class InstaloaderContext:
         session.request = partial(session.request, timeout=self.request_timeout) # type: ignore
         return session
 
+    def get_media_session(self) -> requests.Session:
+        """Returns the anonymous session used for downloading media files.
+
+        It is created once and kept open, so that consecutive downloads reuse the connections to the CDN. Its
+        connection pool holds up to :attr:`media_pool_size` connections per host, so it can be shared by threads.
+
+        .. versionadded:: 4.14"""
+        with self._media_session_lock:
+            if self._media_session is None:
+                session = self.get_anonymous_session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.media_pool_size,
+                                                        pool_maxsize=self.media_pool_size)
+                # Keep the counters of connection pools that are evicted to make room for other hosts
+                pools = adapter.poolmanager.pools
+                dispose_pool = pools.dispose_func
+
+                def dispose(pool):
+                    self._count_media_pool(pool)
+                    if dispose_pool is not None:
+                        dispose_pool(pool)
+                pools.dispose_func = dispose
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._media_session = session
+            return self._media_session
+
+    def _count_media_pool(self, pool) -> None:
+        with self._media_session_lock:
+            self._media_stats['requests'] += pool.num_requests
+            self._media_stats['connections'] += pool.num_connections
+
+    def media_connection_stats(self) -> Dict[str, int]:
+        """Returns how many media requests were made, how many connections were opened for them and how many
+        requests reused an open connection, as well as how many downloads :meth:`write_raw` resumed and how many bytes
+        that saved.
+
+        .. versionadded:: 4.14"""
+        with self._media_session_lock:
+            stats = dict(self._media_stats)
+            if self._media_session is not None:
+                pools = self._media_session.get_adapter('https://').poolmanager.pools
+                with pools.lock:
+                    open_pools = list(pools._container.values())
+                for pool in open_pools:
+                    stats['requests'] += pool.num_requests
+                    stats['connections'] += pool.num_connections
+        stats['reused'] = stats['requests'] - stats['connections']
+        return stats
+
     def save_session(self):
         """Not meant to be used directly, use :meth:`Instaloader.save_session`."""
         return requests.utils.dict_from_cookiejar(self._session.cookies)
@@ -388,7 +465,8 @@ class InstaloaderContext:
     def get_json(self, path: str, params: Dict[str, Any], host: str = 'www.instagram.com',
                  session: Optional[requests.Session] = None, _attempt=1,
                  response_headers: Optional[Dict[str, Any]] = None,
-                 use_post: bool = False) -> Dict[str, Any]:
+                 use_post: bool = False,
+                 headers: Optional[Mapping[str, Optional[str]]] = None) -> Dict[str, Any]:
         """JSON request to Instagram.
 
         :param path: URL, relative to the given domain which defaults to www.instagram.com/
@@ -396,6 +474,7 @@ class InstaloaderContext:
         :param host: Domain part of the URL from where to download the requested JSON; defaults to www.instagram.com
         :param session: Session to use, or None to use self.session
         :param use_post: Use POST instead of GET to make the request
+        :param headers: Headers to send in addition to the session's; a header set to None is not sent
         :return: Decoded response dictionary
         :raises QueryReturnedBadRequestException: When the server responds with a 400.
         :raises QueryReturnedNotFoundException: When the server responds with a 404.
@@ -403,6 +482,9 @@ class InstaloaderContext:
 
         .. versionchanged:: 4.13
            Added `use_post` parameter.
+
+        .. versionchanged:: 4.14
+           Added `headers` parameter.
         """
         is_graphql_query = 'query_hash' in params and 'graphql/query' in path
         is_doc_id_query = 'doc_id' in params and 'graphql/query' in path
@@ -411,18 +493,21 @@ class InstaloaderContext:
         sess = session if session else self._session
         try:
             self.do_sleep()
-            if is_graphql_query:
-                self._rate_controller.wait_before_query(params['query_hash'])
-            if is_doc_id_query:
-                self._rate_controller.wait_before_query(params['doc_id'])
-            if is_iphone_query:
-                self._rate_controller.wait_before_query('iphone')
-            if is_other_query:
-                self._rate_controller.wait_before_query('other')
+            with self._rate_controller_lock:
+                if is_graphql_query:
+                    self._rate_controller.wait_before_query(params['query_hash'])
+                if is_doc_id_query:
+                    self._rate_controller.wait_before_query(params['doc_id'])
+                if is_iphone_query:
+                    self._rate_controller.wait_before_query('iphone')
+                if is_other_query:
+                    self._rate_controller.wait_before_query('other')
             if use_post:
-                resp = sess.post('https://{0}/{1}'.format(host, path), data=params, allow_redirects=False)
+                resp = sess.post('https://{0}/{1}'.format(host, path), data=params, headers=headers,
+                                 allow_redirects=False)
             else:
-                resp = sess.get('https://{0}/{1}'.format(host, path), params=params, allow_redirects=False)
+                resp = sess.get('https://{0}/{1}'.format(host, path), params=params, headers=headers,
+                                allow_redirects=False)
             if resp.status_code in self.fatal_status_codes:
                 redirect = " redirect to {}".format(resp.headers['location']) if 'location' in resp.headers else ""
                 body = ""
@@ -442,7 +527,7 @@ class InstaloaderContext:
                                                  "some time, recreate the session and try again")
                 if redirect_url.startswith('https://{}/'.format(host)):
                     resp = sess.get(redirect_url if redirect_url.endswith('/') else redirect_url + '/',
-                                    params=params, allow_redirects=False)
+                                    params=params, headers=headers, allow_redirects=False)
                 else:
                     break
             if response_headers is not None:
@@ -471,20 +556,34 @@ class InstaloaderContext:
             self.error(error_string + " [retrying; skip with ^C]", repeat_at_end=False)
             try:
                 if isinstance(err, TooManyRequestsException):
-                    if is_graphql_query:
-                        self._rate_controller.handle_429(params['query_hash'])
-                    if is_doc_id_query:
-                        self._rate_controller.handle_429(params['doc_id'])
-                    if is_iphone_query:
-                        self._rate_controller.handle_429('iphone')
-                    if is_other_query:
-                        self._rate_controller.handle_429('other')
+                    with self._rate_controller_lock:
+                        if is_graphql_query:
+                            self._rate_controller.handle_429(params['query_hash'])
+                        if is_doc_id_query:
+                            self._rate_controller.handle_429(params['doc_id'])
+                        if is_iphone_query:
+                            self._rate_controller.handle_429('iphone')
+                        if is_other_query:
+                            self._rate_controller.handle_429('other')
                 return self.get_json(path=path, params=params, host=host, session=sess, _attempt=_attempt + 1,
-                                     response_headers=response_headers)
+                                     response_headers=response_headers, headers=headers)
             except KeyboardInterrupt:
                 self.error("[skipped by user]", repeat_at_end=False)
                 raise ConnectionException(error_string) from err
 
+    def _graphql_query_headers(self, variables_json: str, referer: Optional[str] = None,
+                               rhx_gis: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """Returns the headers to send along with a GraphQL query, on top of the session's."""
+        headers = self._graphql_headers.copy()
+        if referer is not None:
+            headers['referer'] = urllib.parse.quote(referer)
+        if rhx_gis:
+            #self.log("rhx_gis {} variables {}".format(rhx_gis, variables_json))
+            values = "{}:{}".format(rhx_gis, variables_json)
+            x_instagram_gis = hashlib.md5(values.encode()).hexdigest()
+            headers['x-instagram-gis'] = x_instagram_gis
+        return headers
+
     def graphql_query(self, query_hash: str, variables: Dict[str, Any],
                       referer: Optional[str] = None, rhx_gis: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -496,28 +595,12 @@ class InstaloaderContext:
         :param rhx_gis: 'rhx_gis' variable as somewhere returned by Instagram, needed to 'sign' request
         :return: The server's response dictionary.
         """
-        with copy_session(self._session, self.request_timeout) as tmpsession:
-            tmpsession.headers.update(self._default_http_header(empty_session_only=True))
-            del tmpsession.headers['Connection']
-            del tmpsession.headers['Content-Length']
-            tmpsession.headers['authority'] = 'www.instagram.com'
-            tmpsession.headers['scheme'] = 'https'
-            tmpsession.headers['accept'] = '*/*'
-            if referer is not None:
-                tmpsession.headers['referer'] = urllib.parse.quote(referer)
-
-            variables_json = json.dumps(variables, separators=(',', ':'))
-
-            if rhx_gis:
-                #self.log("rhx_gis {} query_hash {}".format(rhx_gis, query_hash))
-                values = "{}:{}".format(rhx_gis, variables_json)
-                x_instagram_gis = hashlib.md5(values.encode()).hexdigest()
-                tmpsession.headers['x-instagram-gis'] = x_instagram_gis
-
-            resp_json = self.get_json('graphql/query',
-                                      params={'query_hash': query_hash,
-                                              'variables': variables_json},
-                                      session=tmpsession)
+        variables_json = json.dumps(variables, separators=(',', ':'))
+        headers = self._graphql_query_headers(variables_json, referer, rhx_gis)
+        resp_json = self.get_json('graphql/query',
+                                  params={'query_hash': query_hash,
+                                          'variables': variables_json},
+                                  headers=headers)
         if 'status' not in resp_json:
             self.error("GraphQL response did not contain a \"status\" field.")
         return resp_json
@@ -534,24 +617,14 @@ class InstaloaderContext:
         :param referer: HTTP Referer, or None.
         :return: The server's response dictionary.
         """
-        with copy_session(self._session, self.request_timeout) as tmpsession:
-            tmpsession.headers.update(self._default_http_header(empty_session_only=True))
-            del tmpsession.headers['Connection']
-            del tmpsession.headers['Content-Length']
-            tmpsession.headers['authority'] = 'www.instagram.com'
-            tmpsession.headers['scheme'] = 'https'
-            tmpsession.headers['accept'] = '*/*'
-            if referer is not None:
-                tmpsession.headers['referer'] = urllib.parse.quote(referer)
-
-            variables_json = json.dumps(variables, separators=(',', ':'))
-
-            resp_json = self.get_json('graphql/query',
-                                      params={'variables': variables_json,
-                                              'doc_id': doc_id,
-                                              'server_timestamps': 'true'},
-                                      session=tmpsession,
-                                      use_post=True)
+        variables_json = json.dumps(variables, separators=(',', ':'))
+        headers = self._graphql_query_headers(variables_json, referer)
+        resp_json = self.get_json('graphql/query',
+                                  params={'variables': variables_json,
+                                          'doc_id': doc_id,
+                                          'server_timestamps': 'true'},
+                                  headers=headers,
+                                  use_post=True)
         if 'status' not in resp_json:
             self.error("GraphQL response did not contain a \"status\" field.")
         return resp_json
@@ -592,6 +665,55 @@ class InstaloaderContext:
             data = _query()
             yield from (edge['node'] for edge in data['edges'])
 
+    def _iphone_http_header(self, cookies: Dict[str, str],
+                            session_headers: Mapping[str, str]) -> requests.structures.CaseInsensitiveDict:
+        """Returns the headers to send along with a request to ``i.instagram.com``, on top of the session's.
+
+        :param cookies: The cookies of the session.
+        :param session_headers: The headers of the session."""
+        # Set headers to simulate an API request from iPad, on top of the headers obtained from previous iPad requests
+        headers = requests.structures.CaseInsensitiveDict()
+        headers['ig-intended-user-id'] = str(self.user_id)
+        headers['x-pigeon-rawclienttime'] = '{:.6f}'.format(time.time())
+        headers.update(self.iphone_headers)
+
+        # Extract key information from cookies if we haven't got it already from a previous request
+        header_cookies_mapping = {'x-mid': 'mid',
+                                 'ig-u-ds-user-id': 'ds_user_id',
+                                 'x-ig-device-id': 'ig_did',
+                                 'x-ig-family-device-id': 'ig_did',
+                                 'family_device_id': 'ig_did'}
+
+        # Map the cookie value to the matching HTTP request header
+        sent_cookies = cookies.copy()
+        for key, value in header_cookies_mapping.items():
+            if value in cookies:
+                if key not in headers and key not in session_headers:
+                    headers[key] = cookies[value]
+                else:
+                    # Remove the cookie value if it's already specified as a header
+                    sent_cookies.pop(value, None)
+
+        # Edge case for ig-u-rur header due to special string encoding in cookie
+        if 'rur' in cookies:
+            if 'ig-u-rur' not in headers and 'ig-u-rur' not in session_headers:
+                headers['ig-u-rur'] = cookies['rur'].strip('\"').encode('utf-8') \
+                                                     .decode('unicode_escape')
+            else:
+                sent_cookies.pop('rur', None)
+
+        # Remove headers specific to Desktop version
+        for header in ['Host', 'Origin', 'X-Instagram-AJAX', 'X-Requested-With', 'Referer']:
+            headers[header] = None
+
+        # No need for cookies if we have a bearer token. An explicit Cookie header keeps the session's cookie jar
+        # from adding the cookies that are left out.
+        if 'authorization' in headers or 'authorization' in session_headers:
+            headers['Cookie'] = ''
+        elif len(sent_cookies) < len(cookies):
+            headers['Cookie'] = '; '.join('{}={}'.format(name, value) for name, value in sent_cookies.items())
+        return headers
+
     def get_iphone_json(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """JSON request to ``i.instagram.com``.
 
@@ -603,70 +725,117 @@ class InstaloaderContext:
         :raises ConnectionException: When query repeatedly failed.
 
         .. versionadded:: 4.2.1"""
-        with copy_session(self._session, self.request_timeout) as tempsession:
-            # Set headers to simulate an API request from iPad
-            tempsession.headers['ig-intended-user-id'] = str(self.user_id)
-            tempsession.headers['x-pigeon-rawclienttime'] = '{:.6f}'.format(time.time())
-
-            # Add headers obtained from previous iPad request
-            tempsession.headers.update(self.iphone_headers)
-
-            # Extract key information from cookies if we haven't got it already from a previous request
-            header_cookies_mapping = {'x-mid': 'mid',
-                                     'ig-u-ds-user-id': 'ds_user_id',
-                                     'x-ig-device-id': 'ig_did',
-                                     'x-ig-family-device-id': 'ig_did',
-                                     'family_device_id': 'ig_did'}
-
-            # Map the cookie value to the matching HTTP request header
-            cookies = tempsession.cookies.get_dict().copy()
-            for key, value in header_cookies_mapping.items():
-                if value in cookies:
-                    if key not in tempsession.headers:
-                        tempsession.headers[key] = cookies[value]
-                    else:
-                        # Remove the cookie value if it's already specified as a header
-                        tempsession.cookies.pop(value, None)
-
-            # Edge case for ig-u-rur header due to special string encoding in cookie
-            if 'rur' in cookies:
-                if 'ig-u-rur' not in tempsession.headers:
-                    tempsession.headers['ig-u-rur'] = cookies['rur'].strip('\"').encode('utf-8') \
-                                                                    .decode('unicode_escape')
-                else:
-                    tempsession.cookies.pop('rur', None)
-
-            # Remove headers specific to Desktop version
-            for header in ['Host', 'Origin', 'X-Instagram-AJAX', 'X-Requested-With', 'Referer']:
-                tempsession.headers.pop(header, None)
-
-            # No need for cookies if we have a bearer token
-            if 'authorization' in tempsession.headers:
-                tempsession.cookies.clear()
-
-            response_headers = dict()    # type: Dict[str, Any]
-            response = self.get_json(path, params, 'i.instagram.com', tempsession, response_headers=response_headers)
-
-            # Extract the ig-set-* headers and use them in the next request
-            for key, value in response_headers.items():
-                if key.startswith('ig-set-'):
-                    self.iphone_headers[key.replace('ig-set-', '')] = value
-                elif key.startswith('x-ig-set-'):
-                    self.iphone_headers[key.replace('x-ig-set-', 'x-ig-')] = value
-
-            return response
+        headers = self._iphone_http_header(self._session.cookies.get_dict(), self._session.headers)
+        response_headers = dict()    # type: Dict[str, Any]
+        response = self.get_json(path, params, 'i.instagram.com', response_headers=response_headers,
+                                 headers=headers)
+        self._update_iphone_headers(response_headers)
+        return response
+
+    def _update_iphone_headers(self, response_headers: Dict[str, Any]) -> None:
+        # Extract the ig-set-* headers and use them in the next request
+        for key, value in response_headers.items():
+            if key.startswith('ig-set-'):
+                self.iphone_headers[key.replace('ig-set-', '')] = value
+            elif key.startswith('x-ig-set-'):
+                self.iphone_headers[key.replace('x-ig-set-', 'x-ig-')] = value
 
     def write_raw(self, resp: Union[bytes, requests.Response], filename: str) -> None:
         """Write raw response data into a file.
 
+        A response is streamed into ``filename + '.temp'``, which replaces filename once complete. If the server
+        supports range requests, the validators of the response (ETag, Last-Modified and Content-Length) are kept in
+        ``filename + '.temp.meta'``, so that a later download of the same, unchanged file continues where this one
+        broke off rather than starting over.
+
         .. versionadded:: 4.2.1"""
         self.log(filename, end=' ', flush=True)
-        with open(filename + '.temp', 'wb') as file:
-            if isinstance(resp, requests.Response):
-                shutil.copyfileobj(resp.raw, file)
-            else:
+        if isinstance(resp, requests.Response):
+            validators, offset = self._partial_download(filename, resp.headers)
+            if offset:
+                resp, offset = self._resume_raw(resp, offset, validators)
+            try:
+                with open(filename + '.temp', 'ab' if offset else 'wb') as file:
+                    shutil.copyfileobj(resp.raw, file)
+                    size = file.tell()
+            finally:
+                resp.close()
+            self._check_download_complete(filename, validators, size)
+        else:
+            with open(filename + '.temp', 'wb') as file:
                 file.write(resp)
         os.replace(filename + '.temp', filename)
+        with suppress(FileNotFoundError):
+            os.remove(filename + '.temp.meta')
+
+    def _partial_download(self, filename: str,
+                          headers: Mapping[str, str]) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Returns the validators of a response about to be written to ``filename + '.temp'``, or None if the server
+        cannot resume it, and the size of a partial download of the same file to continue, or 0."""
+        etag = headers.get('ETag')
+        if etag is not None and etag.startswith('W/'):
+            # Weak ETags cannot be used for range requests
+            etag = None
+        validators = None
+        if (headers.get('Accept-Ranges', '').lower() == 'bytes' and
+                headers.get('Content-Encoding', 'identity').lower() == 'identity' and
+                headers.get('Content-Length', '').isdigit() and (etag or headers.get('Last-Modified'))):
+            validators = {'etag': etag, 'last_modified': headers.get('Last-Modified'),
+                          'length': int(headers['Content-Length'])}
+        offset = 0
+        if validators is not None:
+            with suppress(OSError, ValueError):
+                with open(filename + '.temp.meta') as fp:
+                    if json.load(fp) == validators:
+                        offset = os.path.getsize(filename + '.temp')
+            if not 0 < offset < validators['length']:
+                offset = 0
+                with open(filename + '.temp.meta', 'w') as fp:
+                    json.dump(validators, fp)
+        else:
+            with suppress(FileNotFoundError):
+                os.remove(filename + '.temp.meta')
+        return validators, offset
+
+    @staticmethod
+    def _range_headers(offset: int, validators: Dict[str, Any]) -> Dict[str, str]:
+        # With If-Range, the server sends the whole file rather than the range if the file changed
+        return {'Range': 'bytes={}-'.format(offset), 'If-Range': validators['etag'] or validators['last_modified']}
+
+    def _is_continuation(self, status_code: int, headers: Mapping[str, str], offset: int,
+                         validators: Dict[str, Any]) -> bool:
+        length = validators['length']
+        if status_code != 206 or headers.get('Content-Range') != 'bytes {}-{}/{}'.format(offset, length - 1, length):
+            return False
+        with self._media_session_lock:
+            self._media_stats['resumed'] += 1
+            self._media_stats['resumed_bytes'] += offset
+        self.log('[resumed at {} of {} bytes]'.format(offset, length), end=' ', flush=True)
+        return True
+
+    @staticmethod
+    def _check_download_complete(filename: str, validators: Optional[Dict[str, Any]], size: int) -> None:
+        if validators is not None and size != validators['length']:
+            # The partial file is kept, for the next attempt to continue
+            raise ConnectionException("Download of {} broke off after {} of {} bytes."
+                                      .format(filename, size, validators['length']))
+
+    def _resume_raw(self, resp: requests.Response, offset: int,
+                    validators: Dict[str, Any]) -> Tuple[requests.Response, int]:
+        """Requests the file of resp from offset on. Returns the response to write and the offset to write it at,
+        which are resp and 0 if the server does not continue the file."""
+        try:
+            ranged = self.get_media_session().get(resp.url, headers=self._range_headers(offset, validators),
+                                                  stream=True)
+        except Exception:
+            resp.close()
+            raise
+        if self._is_continuation(ranged.status_code, ranged.headers, offset, validators):
+            resp.close()
+            ranged.raw.decode_content = True
+            return ranged, offset
+        ranged.close()
+        return resp, 0
 
     def get_raw(self, url: str, _attempt=1) -> requests.Response:
         """Downloads a file anonymously.
@@ -676,12 +845,12 @@ class InstaloaderContext:
         :raises ConnectionException: When download failed.
 
         .. versionadded:: 4.2.1"""
-        with self.get_anonymous_session() as anonymous_session:
-            resp = anonymous_session.get(url, stream=True)
+        resp = self.get_media_session().get(url, stream=True)
         if resp.status_code == 200:
             resp.raw.decode_content = True
             return resp
-        else:
+        # Close the response before raising, so that its pooled connection is released
+        try:
             if resp.status_code == 403:
                 # suspected invalid URL signature
                 raise QueryReturnedForbiddenException(self._response_error(resp))
@@ -689,6 +858,8 @@ class InstaloaderContext:
                 # 404 not worth retrying.
                 raise QueryReturnedNotFoundException(self._response_error(resp))
             raise ConnectionException(self._response_error(resp))
+        finally:
+            resp.close()
 
     def get_and_write_raw(self, url: str, filename: str) -> None:
         """Downloads and writes anonymously-requested raw data into a file.
@@ -707,11 +878,11 @@ class InstaloaderContext:
 
         .. versionadded:: 4.7.6
         """
-        with self.get_anonymous_session() as anonymous_session:
-            resp = anonymous_session.head(url, allow_redirects=allow_redirects)
+        resp = self.get_media_session().head(url, allow_redirects=allow_redirects)
         if resp.status_code == 200:
             return resp
-        else:
+        # Close the response before raising, so that its pooled connection is released
+        try:
             if resp.status_code == 403:
                 # suspected invalid URL signature
                 raise QueryReturnedForbiddenException(self._response_error(resp))
@@ -719,6 +890,8 @@ class InstaloaderContext:
                 # 404 not worth retrying.
                 raise QueryReturnedNotFoundException(self._response_error(resp))
             raise ConnectionException(self._response_error(resp))
+        finally:
+            resp.close()
 
     @property
     def root_rhx_gis(self) -> Optional[str]:
@@ -853,6 +1026,12 @@ class RateController:
 
         It calls :meth:`RateController.query_waittime` to determine the time needed to wait and then calls
         :meth:`RateController.sleep` to wait until the request can be made."""
+        waittime = self._waittime_before_query(query_type)
+        if waittime > 0:
+            self.sleep(waittime)
+        self._track_query(query_type)
+
+    def _waittime_before_query(self, query_type: str) -> float:
         waittime = self.query_waittime(query_type, time.monotonic(), False)
         assert waittime >= 0
         if waittime > 15:
@@ -860,8 +1039,9 @@ class RateController:
                                   "{} minutes".format(round(waittime / 60)))
             self._context.log("\nToo many queries in the last time. Need to wait {}, until {:%H:%M}."
                               .format(formatted_waittime, datetime.now() + timedelta(seconds=waittime)))
-        if waittime > 0:
-            self.sleep(waittime)
+        return waittime
+
+    def _track_query(self, query_type: str) -> None:
         if query_type not in self._query_timestamps:
             self._query_timestamps[query_type] = [time.monotonic()]
         else:
@@ -872,6 +1052,11 @@ class RateController:
 
         It calls :meth:`RateController.query_waittime` to determine the time needed to wait and then calls
         :meth:`RateController.sleep` to wait until we can repeat the same request."""
+        waittime = self._waittime_after_429(query_type)
+        if waittime > 0:
+            self.sleep(waittime)
+
+    def _waittime_after_429(self, query_type: str) -> float:
         current_time = time.monotonic()
         waittime = self.query_waittime(query_type, current_time, True)
         assert waittime >= 0
@@ -886,5 +1071,4 @@ class RateController:
             self._context.error("The request will be retried in {}, at {:%H:%M}."
                                 .format(formatted_waittime, datetime.now() + timedelta(seconds=waittime)),
                                 repeat_at_end=False)
-        if waittime > 0:
-            self.sleep(waittime)
+        return waittime
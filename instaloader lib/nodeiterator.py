@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from lzma import LZMAError
 from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, TypeVar
 
+from .asynccontext import AsyncInstaloaderContext
 from .exceptions import AbortDownloadException, InvalidArgumentException
 from .instaloadercontext import InstaloaderContext
 
@@ -93,14 +94,17 @@ class NodeIterator(Iterator[T]):
         self._query_referer = query_referer
         self._page_index = 0
         self._total_index = 0
-        if first_data is not None:
-            self._data = first_data
-            self._best_before = datetime.now() + NodeIterator._shelf_life
-        else:
-            self._data = self._query()
+        self._best_before: Optional[datetime] = None
+        self._data = self._first_page(first_data)
         self._first_node: Optional[Dict] = None
         self._is_first = is_first
 
+    def _first_page(self, first_data: Optional[Dict[str, Any]]) -> Dict:
+        if first_data is not None:
+            self._best_before = datetime.now() + NodeIterator._shelf_life
+            return first_data
+        return self._query()
+
     def _query(self, after: Optional[str] = None) -> Dict:
         if self._doc_id is not None:
             return self._query_doc_id(self._doc_id, after)
@@ -109,29 +113,32 @@ class NodeIterator(Iterator[T]):
             return self._query_query_hash(self._query_hash, after)
 
     def _query_doc_id(self, doc_id: str, after: Optional[str] = None) -> Dict:
+        return self._received(
+            self._context.doc_id_graphql_query(doc_id, self._doc_id_variables(after), self._query_referer)
+        )
+
+    def _query_query_hash(self, query_hash: str, after: Optional[str] = None) -> Dict:
+        return self._received(
+            self._context.graphql_query(query_hash, self._query_hash_variables(after), self._query_referer)
+        )
+
+    def _doc_id_variables(self, after: Optional[str]) -> Dict[str, Any]:
         pagination_variables: Dict[str, Any] = {'__relay_internal__pv__PolarisFeedShareMenurelayprovider': False}
         if after is not None:
             pagination_variables['after'] = after
             pagination_variables['before'] = None
             pagination_variables['first'] = 12
             pagination_variables['last'] = None
-        data = self._edge_extractor(
-            self._context.doc_id_graphql_query(
-                doc_id, {**self._query_variables, **pagination_variables}, self._query_referer
-            )
-        )
-        self._best_before = datetime.now() + NodeIterator._shelf_life
-        return data
+        return {**self._query_variables, **pagination_variables}
 
-    def _query_query_hash(self, query_hash: str, after: Optional[str] = None) -> Dict:
+    def _query_hash_variables(self, after: Optional[str]) -> Dict[str, Any]:
         pagination_variables: Dict[str, Any] = {'first': NodeIterator._graphql_page_length}
         if after is not None:
             pagination_variables['after'] = after
-        data = self._edge_extractor(
-            self._context.graphql_query(
-                query_hash, {**self._query_variables, **pagination_variables}, self._query_referer
-            )
-        )
+        return {**self._query_variables, **pagination_variables}
+
+    def _received(self, response: Dict[str, Any]) -> Dict:
+        data = self._edge_extractor(response)
         self._best_before = datetime.now() + NodeIterator._shelf_life
         return data
 
@@ -140,35 +147,43 @@ class NodeIterator(Iterator[T]):
 
     def __next__(self) -> T:
         if self._page_index < len(self._data['edges']):
-            node = self._data['edges'][self._page_index]['node']
-            page_index, total_index = self._page_index, self._total_index
-            try:
-                self._page_index += 1
-                self._total_index += 1
-            except KeyboardInterrupt:
-                self._page_index, self._total_index = page_index, total_index
-                raise
-            item = self._node_wrapper(node)
-            if self._is_first is not None:
-                if self._is_first(item, self.first_item):
-                    self._first_node = node
-            else:
-                if self._first_node is None:
-                    self._first_node = node
-            return item
+            return self._next_node()
         if self._data.get('page_info', {}).get('has_next_page'):
-            query_response = self._query(self._data['page_info']['end_cursor'])
-            if self._data['edges'] != query_response['edges'] and len(query_response['edges']) > 0:
-                page_index, data = self._page_index, self._data
-                try:
-                    self._page_index = 0
-                    self._data = query_response
-                except KeyboardInterrupt:
-                    self._page_index, self._data = page_index, data
-                    raise
+            if self._turn_page(self._query(self._data['page_info']['end_cursor'])):
                 return self.__next__()
         raise StopIteration()
 
+    def _next_node(self) -> T:
+        node = self._data['edges'][self._page_index]['node']
+        page_index, total_index = self._page_index, self._total_index
+        try:
+            self._page_index += 1
+            self._total_index += 1
+        except KeyboardInterrupt:
+            self._page_index, self._total_index = page_index, total_index
+            raise
+        item = self._node_wrapper(node)
+        if self._is_first is not None:
+            if self._is_first(item, self.first_item):
+                self._first_node = node
+        else:
+            if self._first_node is None:
+                self._first_node = node
+        return item
+
+    def _turn_page(self, query_response: Dict) -> bool:
+        """Continue with the next page, unless it is empty or a repetition of the current one."""
+        if self._data['edges'] != query_response['edges'] and len(query_response['edges']) > 0:
+            page_index, data = self._page_index, self._data
+            try:
+                self._page_index = 0
+                self._data = query_response
+            except KeyboardInterrupt:
+                self._page_index, self._data = page_index, data
+                raise
+            return True
+        return False
+
     @property
     def count(self) -> Optional[int]:
         """The ``count`` as returned by Instagram. This is not always the total count this iterator will yield."""
@@ -254,6 +269,72 @@ class NodeIterator(Iterator[T]):
             self._first_node = frozen.first_node
 
 
+class AsyncNodeIterator(NodeIterator[T]):
+    """
+    Asynchronous counterpart of :class:`NodeIterator`, which queries the pages through an
+    :class:`AsyncInstaloaderContext`::
+
+       posts = AsyncNodeIterator(async_context, query_hash, edge_extractor,
+                                 lambda node: Post(L.context, node), query_variables)
+       async for post in posts:
+           do_something_with(post)
+
+    The first page is queried when the iteration starts. Like a NodeIterator, it can be frozen and thawn, also by
+    :func:`resumable_iteration`.
+
+    .. versionadded:: 4.14
+    """
+
+    def __init__(self,
+                 context: AsyncInstaloaderContext,
+                 query_hash: Optional[str],
+                 edge_extractor: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 node_wrapper: Callable[[Dict], T],
+                 query_variables: Optional[Dict[str, Any]] = None,
+                 query_referer: Optional[str] = None,
+                 first_data: Optional[Dict[str, Any]] = None,
+                 is_first: Optional[Callable[[T, Optional[T]], bool]] = None,
+                 doc_id: Optional[str] = None):
+        self._async_context = context
+        super().__init__(context, query_hash, edge_extractor, node_wrapper, query_variables,  # type: ignore
+                         query_referer, first_data, is_first, doc_id)
+
+    def _first_page(self, first_data: Optional[Dict[str, Any]]) -> Dict:
+        # Without first_data, the first page is queried by __anext__
+        if first_data is not None:
+            return super()._first_page(first_data)
+        return None  # type: ignore
+
+    async def _query_async(self, after: Optional[str] = None) -> Dict:
+        if self._doc_id is not None:
+            return self._received(await self._async_context.doc_id_graphql_query(
+                self._doc_id, self._doc_id_variables(after), self._query_referer
+            ))
+        assert self._query_hash is not None
+        return self._received(await self._async_context.graphql_query(
+            self._query_hash, self._query_hash_variables(after), self._query_referer
+        ))
+
+    def __iter__(self):
+        raise TypeError("AsyncNodeIterator has to be iterated with 'async for'.")
+
+    def __next__(self) -> T:
+        raise TypeError("AsyncNodeIterator has to be iterated with 'async for'.")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> T:
+        if self._data is None:
+            self._data = await self._query_async()
+        if self._page_index < len(self._data['edges']):
+            return self._next_node()
+        if self._data.get('page_info', {}).get('has_next_page'):
+            if self._turn_page(await self._query_async(self._data['page_info']['end_cursor'])):
+                return await self.__anext__()
+        raise StopAsyncIteration()
+
+
 @contextmanager
 def resumable_iteration(context: InstaloaderContext,
                         iterator: Iterable,
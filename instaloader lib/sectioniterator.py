@@ -1,5 +1,6 @@
 from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
 
+from .asynccontext import AsyncInstaloaderContext
 from .instaloadercontext import InstaloaderContext
 
 T = TypeVar('T')
@@ -19,28 +20,80 @@ class SectionIterator(Iterator[T]):
         self._sections_extractor = sections_extractor
         self._media_wrapper = media_wrapper
         self._query_path = query_path
-        self._data = first_data or self._query()
+        self._data = self._first_page(first_data)
         self._page_index = 0
         self._section_index = 0
 
+    def _first_page(self, first_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return first_data or self._query()
+
     def __iter__(self):
         return self
 
     def _query(self, max_id: Optional[str] = None) -> Dict[str, Any]:
-        pagination_variables = {"max_id": max_id} if max_id is not None else {}
-        return self._sections_extractor(
-            self._context.get_json(self._query_path, params={"__a": 1, "__d": "dis", **pagination_variables})
-        )
+        return self._sections_extractor(self._context.get_json(self._query_path, params=_query_params(max_id)))
 
     def __next__(self) -> T:
         if self._page_index < len(self._data['sections']):
-            media = self._data['sections'][self._page_index]['layout_content']['medias'][self._section_index]['media']
-            self._section_index += 1
-            if self._section_index >= len(self._data['sections'][self._page_index]['layout_content']['medias']):
-                self._section_index = 0
-                self._page_index += 1
-            return self._media_wrapper(media)
+            return self._next_media()
         if self._data['more_available']:
             self._page_index, self._section_index, self._data = 0, 0, self._query(self._data["next_max_id"])
             return self.__next__()
         raise StopIteration()
+
+    def _next_media(self) -> T:
+        media = self._data['sections'][self._page_index]['layout_content']['medias'][self._section_index]['media']
+        self._section_index += 1
+        if self._section_index >= len(self._data['sections'][self._page_index]['layout_content']['medias']):
+            self._section_index = 0
+            self._page_index += 1
+        return self._media_wrapper(media)
+
+
+class AsyncSectionIterator(SectionIterator[T]):
+    """Asynchronous counterpart of :class:`SectionIterator`, which queries the pages through an
+    :class:`AsyncInstaloaderContext` and is iterated with ``async for``. The first page is queried when the iteration
+    starts.
+
+    .. versionadded:: 4.14"""
+    def __init__(self,
+                 context: AsyncInstaloaderContext,
+                 sections_extractor: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 media_wrapper: Callable[[Dict], T],
+                 query_path: str,
+                 first_data: Optional[Dict[str, Any]] = None):
+        self._async_context = context
+        super().__init__(context, sections_extractor, media_wrapper, query_path, first_data)  # type: ignore
+
+    def _first_page(self, first_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # Without first_data, the first page is queried by __anext__
+        return first_data  # type: ignore
+
+    async def _query_async(self, max_id: Optional[str] = None) -> Dict[str, Any]:
+        return self._sections_extractor(
+            await self._async_context.get_json(self._query_path, params=_query_params(max_id))
+        )
+
+    def __iter__(self):
+        raise TypeError("AsyncSectionIterator has to be iterated with 'async for'.")
+
+    def __next__(self) -> T:
+        raise TypeError("AsyncSectionIterator has to be iterated with 'async for'.")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> T:
+        if self._data is None:
+            self._data = await self._query_async()
+        if self._page_index < len(self._data['sections']):
+            return self._next_media()
+        if self._data['more_available']:
+            self._page_index, self._section_index, self._data = 0, 0, await self._query_async(self._data["next_max_id"])
+            return await self.__anext__()
+        raise StopAsyncIteration()
+
+
+def _query_params(max_id: Optional[str]) -> Dict[str, Any]:
+    pagination_variables = {"max_id": max_id} if max_id is not None else {}
+    return {"__a": 1, "__d": "dis", **pagination_variables}
@@ -0,0 +1,184 @@
+"""SQLite store for scraped profiles, posts and comments.
+
+Usage:
+    store = ResultStore("results.db")
+    for post in store.posts(start="2024-01-01", end="2024-02-01"):
+        print(post["profile"], post["shortcode"], post["likes"])
+
+The database runs in WAL mode, so it can be queried while a scrape is writing to it.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    username TEXT PRIMARY KEY,
+    fullname TEXT,
+    bio TEXT,
+    followers INTEGER,
+    following INTEGER,
+    posts INTEGER,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS posts (
+    shortcode TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    date TEXT NOT NULL,
+    caption TEXT,
+    likes INTEGER,
+    comment_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS posts_profile_date ON posts (profile, date);
+CREATE INDEX IF NOT EXISTS posts_date ON posts (date);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    shortcode TEXT NOT NULL,
+    commenter TEXT,
+    comment TEXT
+);
+CREATE INDEX IF NOT EXISTS comments_shortcode ON comments (shortcode);
+"""
+
+
+class ResultStore:
+    """Stores post records in SQLite, committing them in batches.
+
+    Records passed to :meth:`add_post` are buffered and written in one
+    transaction once ``batch_size`` of them are pending, or when :meth:`flush`
+    is called. A post that is stored again replaces its earlier version, and its
+    comments if the record carries a list of them.
+    One store may be shared by several worker threads.
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent, commits skip the fsync
+        self._connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = []
+
+    def save_profile(self, profile):
+        """Insert or update a profile as stored in a job's ``profile_data``."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO profiles (username, fullname, bio, followers, following, posts, updated_at) "
+                "VALUES (:username, :fullname, :bio, :followers, :following, :posts, :updated_at) "
+                "ON CONFLICT (username) DO UPDATE SET fullname = excluded.fullname, bio = excluded.bio, "
+                "followers = excluded.followers, following = excluded.following, posts = excluded.posts, "
+                "updated_at = excluded.updated_at",
+                dict(profile, updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def add_post(self, profile, record):
+        """Queue a post record of ``profile``; it is committed with the next batch."""
+        with self._lock:
+            self._pending.append((profile, record))
+            if len(self._pending) >= self.batch_size:
+                self._write_pending()
+
+    def flush(self):
+        """Commit every queued record."""
+        with self._lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        posts = []  # Records with their comments, which replace the stored ones
+        posts_without_comments = []  # Records without comments, which keep the stored ones
+        comments = []
+        latest = {}  # Shortcode -> latest pending (profile, record), so that the statements below need no order
+        for profile, record in self._pending:
+            previous = latest.get(record["shortcode"])
+            if (previous is not None and isinstance(previous[1]["comments"], list) and
+                    not isinstance(record["comments"], list)):
+                record = dict(record, comments=previous[1]["comments"])
+            latest[record["shortcode"]] = (profile, record)
+        for profile, record in latest.values():
+            if isinstance(record["comments"], list):
+                posts.append((record["shortcode"], profile, record["date"], record["caption"], record["likes"],
+                              len(record["comments"])))
+                comments.extend((record["shortcode"], comment["commenter"], comment["comment"])
+                                for comment in record["comments"])
+            else:
+                posts_without_comments.append((record["shortcode"], profile, record["date"], record["caption"],
+                                               record["likes"], record["comments"] or 0))
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO posts (shortcode, profile, date, caption, likes, comment_count) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (shortcode) DO UPDATE SET profile = excluded.profile, date = excluded.date, "
+                "caption = excluded.caption, likes = excluded.likes, comment_count = excluded.comment_count",
+                posts)
+            self._connection.executemany(
+                "INSERT INTO posts (shortcode, profile, date, caption, likes, comment_count) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (shortcode) DO UPDATE SET profile = excluded.profile, date = excluded.date, "
+                "caption = excluded.caption, likes = excluded.likes",
+                posts_without_comments)
+            self._connection.executemany("DELETE FROM comments WHERE shortcode = ?",
+                                         [(post[0],) for post in posts])
+            self._connection.executemany("INSERT INTO comments (shortcode, commenter, comment) VALUES (?, ?, ?)",
+                                         comments)
+        self._pending = []
+
+    def close(self):
+        """Commit the queued records and close the database."""
+        with self._lock:
+            self._write_pending()
+            self._connection.close()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            self._write_pending()  # Queries see every record added so far
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def profile(self, username):
+        """Return the stored profile as a dict, or None."""
+        rows = self._query("SELECT * FROM profiles WHERE username = ?", (username,))
+        return dict(rows[0]) if rows else None
+
+    @staticmethod
+    def _where(profile, start, end):
+        conditions, parameters = [], []
+        if profile is not None:
+            conditions.append("profile = ?")
+            parameters.append(profile)
+        if start is not None:
+            conditions.append("date >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            parameters.append(end + " 23:59:59" if len(end) == 10 else end)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), parameters
+
+    def posts(self, profile=None, start=None, end=None):
+        """Return the stored posts, newest first, optionally of one profile and within [start, end].
+
+        ``start`` and ``end`` are dates (``YYYY-MM-DD``) or timestamps (``YYYY-MM-DD HH:MM:SS``);
+        a plain ``end`` date includes that whole day."""
+        where, parameters = self._where(profile, start, end)
+        return [dict(row) for row in self._query(f"SELECT * FROM posts{where} ORDER BY date DESC", parameters)]
+
+    def comments(self, shortcode):
+        """Return the stored comments of a post."""
+        return [dict(row) for row in self._query(
+            "SELECT commenter, comment FROM comments WHERE shortcode = ? ORDER BY id", (shortcode,))]
+
+    def has_post(self, shortcode):
+        return bool(self._query("SELECT 1 FROM posts WHERE shortcode = ?", (shortcode,)))
+
+    def newest_date(self, profile):
+        """Date of the newest stored post of ``profile``, or None."""
+        rows = self._query("SELECT MAX(date) FROM posts WHERE profile = ?", (profile,))
+        return rows[0][0]
+
+    def post_counts(self, start=None, end=None):
+        """Return ``{profile: number of posts}`` of the posts within [start, end]."""
+        where, parameters = self._where(None, start, end)
+        return dict(self._query(f"SELECT profile, COUNT(*) FROM posts{where} GROUP BY profile", parameters))
@@ -1,14 +1,53 @@
 import json
+import logging
 import os
-import random
-import time
+import queue
+import sys
 import threading
-import instaloader
 import signal
+from logging.handlers import RotatingFileHandler
 from tkinter import *
 from tkinter import messagebox
 from tkcalendar import Calendar
-from datetime import datetime
+from result_store import ResultStore
+from scrape_engine import PacingScheduler, ScrapeEngine, ScrapeJob, SessionPool, create_loader
+
+
+class LogSink:
+    """Thread-safe sink for progress messages.
+
+    Writers only enqueue, so scraping threads never wait for the GUI. The Tk main
+    loop collects queued messages in batches with :meth:`drain`, and every regular
+    message is also spilled to a rotating log file.
+    """
+
+    def __init__(self, log_filename="scraper.log", max_bytes=5 * 1024 * 1024, backup_count=3):
+        self._queue = queue.SimpleQueue()
+        self._logger = logging.getLogger("scraper")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        if not self._logger.handlers:
+            handler = RotatingFileHandler(log_filename, maxBytes=max_bytes, backupCount=backup_count,
+                                          encoding="utf-8")
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            self._logger.addHandler(handler)
+
+    def write(self, message, overwrite=False):
+        """Queue a message; ``overwrite`` messages replace the previous line and are not logged to file."""
+        self._queue.put((message, overwrite))
+        if not overwrite:
+            self._logger.info(message)
+
+    def drain(self, max_items):
+        """Return up to ``max_items`` queued ``(message, overwrite)`` pairs."""
+        entries = []
+        try:
+            while len(entries) < max_items:
+                entries.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return entries
+
 
 class InstagramScraperApp:
     def __init__(self, root):
@@ -52,6 +91,18 @@ class InstagramScraperApp:
         self.scrape_comments_checkbox = Checkbutton(root, text="Scrape Comments", variable=self.scrape_comments_var)
         self.scrape_comments_checkbox.pack()
 
+        # Checkbox for updating an earlier scrape instead of starting over
+        self.incremental_var = BooleanVar()
+        self.incremental_var.set(False)
+        self.incremental_checkbox = Checkbutton(root, text="Incremental Update", variable=self.incremental_var)
+        self.incremental_checkbox.pack()
+
+        # Checkbox for storing the results in the SQLite database as well
+        self.use_db_var = BooleanVar()
+        self.use_db_var.set(False)
+        self.use_db_checkbox = Checkbutton(root, text="Save to Database", variable=self.use_db_var)
+        self.use_db_checkbox.pack()
+
         self.scrape_button = Button(root, text="Scrape", command=self.start_scraping)
         self.scrape_button.pack()
 
@@ -65,12 +116,21 @@ class InstagramScraperApp:
 
         self.start_date = None
         self.end_date = None
-        self.last_post_shortcode = None
         self.state_filename = "scraping_state.json"  # File to save state
+        self.db_filename = "scrape_results.db"  # SQLite database used when "Save to Database" is checked
 
-        # Initialize data storage
-        self.profile_data = {"profile": {}, "posts": []}
-        self.data_filename = None
+        # Progress messages are queued and rendered in batches by the Tk main loop
+        self.log_sink = LogSink()
+        self.max_output_lines = 1000  # Lines kept in the output widget; the log file keeps everything
+        self.drain_interval_ms = 100
+        self.max_drain_batch = 500
+        self.root.after(self.drain_interval_ms, self.drain_output)
+
+        # The headless engine does the actual scraping; sessions and pacing outlive single runs
+        self.engine = None
+        self.pacer = PacingScheduler()
+        self.session_pool = SessionPool(lambda: create_loader(self.pacer), log=self.update_output)
+        self.scrape_thread = None
 
         # Register signal handler for graceful shutdown
         signal.signal(signal.SIGINT, self.handle_exit)
@@ -108,214 +168,92 @@ class InstagramScraperApp:
         self.calendar_window.destroy()
 
     def start_scraping(self):
-        # Start the scraping process in a new thread
-        threading.Thread(target=self.scrape_profile).start()
+        # Start the scraping process in a new thread, unless one is still running
+        if self.scrape_thread is not None and self.scrape_thread.is_alive():
+            self.update_output("Scraping is already in progress.")
+            return
+        self.scrape_thread = threading.Thread(target=self.scrape_profile)
+        self.scrape_thread.start()
 
     def update_output(self, message, overwrite=False):
-        """Update the GUI output text widget from a different thread."""
-        if overwrite:
-            # Move the cursor to the end of the last line and overwrite it
-            self.output_text.delete('end-1c linestart', 'end')  # Delete the last line's content
-            self.output_text.insert('end-1c linestart', message + "\n")
-        else:
-            self.output_text.insert(END, message + "\n")
+        """Queue a message for the output widget. Safe to call from any thread."""
+        self.log_sink.write(message, overwrite)
+
+    def drain_output(self):
+        """Render queued messages on the Tk main loop and reschedule itself."""
+        entries = self.log_sink.drain(self.max_drain_batch)
+        if entries:
+            self.render_output(entries)
+        self.root.after(self.drain_interval_ms, self.drain_output)
+
+    def render_output(self, entries):
+        """Append a batch of messages to the output widget with a single insert."""
+        lines = []
+        replace_last = False
+        for message, overwrite in entries:
+            if overwrite and lines:
+                lines[-1] = message
+            elif overwrite:
+                replace_last = True
+                lines.append(message)
+            else:
+                lines.append(message)
+        if replace_last:
+            self.output_text.delete('end-2l', 'end-1c')  # Delete the widget's last line
+        self.output_text.insert('end-1c', "\n".join(lines) + "\n")
+
+        # Keep only the most recent lines in the widget
+        excess = int(self.output_text.index('end-1c').split('.')[0]) - 1 - self.max_output_lines
+        if excess > 0:
+            self.output_text.delete('1.0', f'{excess + 1}.0')
         self.output_text.yview(END)
-        self.root.update_idletasks()  # Ensure GUI updates in real-time
-
-    def random_delay(self):
-        """Introduce a random delay to humanize the scraping process."""
-        delay = random.uniform(2, 5)  # Random delay between 2 and 5 seconds
-        self.update_output(f"Waiting for {delay:.2f} seconds...")
-        self.root.update_idletasks()  # Ensure GUI updates in real-time
-        time.sleep(delay)
-
-    def random_scroll(self):
-        """Simulate random scrolling to humanize the scraping process."""
-        scroll_amount = random.randint(1, 10)
-        scroll_direction = random.choice(['up', 'down'])
-        self.update_output(f"Scrolling {scroll_direction} by {scroll_amount} lines...")
-        self.output_text.yview_scroll(scroll_amount if scroll_direction == 'down' else -scroll_amount, "units")
-        self.random_delay()
-
-    def save_data(self):
-        """Save the current profile data to the JSON file."""
-        if self.data_filename:
-            try:
-                with open(self.data_filename, "w", encoding="utf-8") as json_file:
-                    json.dump(self.profile_data, json_file, ensure_ascii=False, indent=4)
-                self.update_output(f"Data saved to {self.data_filename}")
-            except IOError as e:
-                self.update_output(f"Error writing to file: {e}")
-
-    def save_state(self):
-        """Save the current state to a JSON file."""
-        state = {
-            "last_post_shortcode": self.last_post_shortcode,
-            "start_date": self.start_date,
-            "end_date": self.end_date,
-        }
-        with open(self.state_filename, "w", encoding="utf-8") as state_file:
-            json.dump(state, state_file, ensure_ascii=False, indent=4)
-        self.update_output(f"State saved to {self.state_filename}")
 
     def load_state(self):
         """Load the saved state from a JSON file."""
         if os.path.exists(self.state_filename):
             with open(self.state_filename, "r", encoding="utf-8") as state_file:
                 state = json.load(state_file)
-                self.last_post_shortcode = state.get("last_post_shortcode")
                 self.start_date = state.get("start_date")
                 self.end_date = state.get("end_date")
-                self.update_output(f"Resumed from saved state: {state}")
+                self.update_output(f"Resumed time period from saved state: {self.start_date} to {self.end_date}")
         else:
             self.update_output("No saved state found. Starting fresh.")
 
-    def countdown_timer(self, delay_seconds):
-        """Show a countdown timer in the GUI and wait."""
-        for remaining in range(delay_seconds, 0, -1):
-            self.update_output(f"Resuming in {remaining} seconds...", overwrite=True)
-            time.sleep(1)
-        self.update_output("Resuming...", overwrite=True)
-
-    def exponential_backoff(self, attempt):
-        """Calculate the delay for exponential backoff."""
-        base_delay = 60  # Base delay in seconds
-        max_delay = 600  # Maximum delay in seconds
-        delay = min(base_delay * (1.5 ** attempt), max_delay)
-        self.update_output(f"Waiting for {delay} seconds before retrying...")
-        time.sleep(delay)
-
     def scrape_profile(self):
         target_profile = self.target_profile_entry.get()
         username = self.username_entry.get()
         password = self.password_entry.get()
         scrape_comments = self.scrape_comments_var.get()
+        incremental = self.incremental_var.get()
+        use_db = self.use_db_var.get()
 
-        # Load state if available
-        self.load_state()
+        # Fall back to the saved time period if none was selected
+        if not (self.start_date and self.end_date):
+            self.load_state()
 
         if target_profile and self.start_date and self.end_date:
-            self.update_output("Starting scraping process...")
-
-            # Define JSON filename
-            self.data_filename = f"{target_profile}.json"
-
-            loader = instaloader.Instaloader()
-
-            attempt = 0
-            while attempt < 5:  # Retry up to 5 times
-                try:
-                    # Perform login
-                    self.update_output("Logging in...")
-                    loader.login(username, password)
-                    self.update_output("Login successful")
-
-                    # Load target profile data
-                    profile = instaloader.Profile.from_username(loader.context, target_profile)
-                    self.profile_data["profile"] = {
-                        "username": profile.username,
-                        "fullname": profile.full_name,
-                        "bio": profile.biography,
-                        "followers": profile.followers,
-                        "following": profile.followees,
-                        "posts": profile.mediacount
-                    }
-
-                    # Scrape posts
-                    posts_scraped = 0
-                    for post in profile.get_posts():
-                        if post.date < datetime.strptime(self.start_date, '%Y-%m-%d') or post.date > datetime.strptime(self.end_date, '%Y-%m-%d'):
-                            continue
-
-                        post_details = {
-                            "shortcode": post.shortcode,
-                            "date": post.date.strftime('%Y-%m-%d %H:%M:%S'),
-                            "caption": post.caption,
-                            "likes": post.likes,
-                            "comments": 0
-                        }
-
-                        # Save state after each post
-                        self.last_post_shortcode = post.shortcode
-                        self.save_state()
-
-                        try:
-                            self.update_output(f"Scraping post {post.date.strftime('%Y-%m-%d %H:%M:%S')}")
-                            posts_scraped += 1
-                        except instaloader.exceptions.BadResponseException as e:
-                            self.update_output(f"Bad Response Exception for post {post.date.strftime('%Y-%m-%d %H:%M:%S')}: {e}")
-                            self.handle_bad_request_error(post.shortcode)
-                            continue  # Skip to the next post
-
-                        # Scrape comments if enabled
-                        if scrape_comments:
-                            try:
-                                comments = []
-                                for comment in post.get_comments():
-                                    comments.append({
-                                        "comment": comment.text,
-                                        "commenter": comment.owner.username
-                                    })
-                                post_details["comments"] = comments
-                                self.update_output(f"Scraped comments for post {post.date.strftime('%Y-%m-%d %H:%M:%S')}")
-                            except Exception as e:
-                                self.update_output(f"Error scraping comments for post {post.date.strftime('%Y-%m-%d %H:%M:%S')}: {e}")
-
-                        # Update profile data
-                        self.profile_data["posts"].append(post_details)
-
-                        # Save data after each post
-                        self.save_data()
-
-                        # Handle rate limit errors
-                        if posts_scraped % 10 == 0:  # Example threshold
-                            self.handle_rate_limit()
-
-                        self.random_scroll()  # Add random scrolling
-
-                    self.update_output(f"Scraped {posts_scraped} posts from {target_profile}")
-                    self.save_data()
-                    break  # Exit retry loop on success
-
-                except instaloader.exceptions.InstaloaderException as e:
-                    if "checkpoint_required" in str(e).lower():
-                        self.update_output("Checkpoint required. Please log in manually and solve the CAPTCHA.")
-                        self.save_state()  # Save state before pausing
-                        messagebox.showinfo("Manual Login Required", 
-                            "A checkpoint is required. Please log in manually and solve any CAPTCHA. Afterward, click OK to resume scraping.")
-                        self.resume_scraping(self.last_post_shortcode)
-                        break
-                    else:
-                        self.update_output(f"Instaloader Exception encountered: {e}")
-                        attempt += 1
-                        self.exponential_backoff(attempt)  # Wait before retrying
-                except Exception as e:
-                    self.update_output(f"Unexpected error: {e}")
-                    break
-
-    def handle_rate_limit(self):
-        """Handle rate limit errors by waiting and retrying."""
-        self.update_output("Encountered rate limit error. Waiting before retrying...")
-        delay_seconds = random.randint(120, 300)  # Wait between 2 and 5 minutes
-        self.countdown_timer(delay_seconds)
-        self.update_output("Resuming scraping...")
-
-    def handle_bad_request_error(self, last_post_shortcode):
-        """Handle Bad Response errors by waiting and resuming."""
-        self.update_output("Encountered a Bad Response error. Waiting before retrying...")
-        delay_seconds = random.randint(60, 120)  # Wait between 1 and 2 minutes
-        self.countdown_timer(delay_seconds)
-        self.update_output("Resuming scraping...")
-        self.resume_scraping(last_post_shortcode)
-
-    def resume_scraping(self, last_post_shortcode):
-        """Resume scraping from the last successful post."""
-        self.update_output(f"Resuming scraping from post {last_post_shortcode}...")
-        self.start_scraping()  # Restart scraping process
+            job = ScrapeJob(target_profile, self.start_date, self.end_date, scrape_comments,
+                            state_filename=self.state_filename, incremental=incremental)
+            store = ResultStore(self.db_filename) if use_db else None
+            self.engine = ScrapeEngine(username, password, pacer=self.pacer, sessions=self.session_pool,
+                                       log=self.update_output, on_checkpoint=self.confirm_checkpoint, store=store)
+            try:
+                self.engine.run_job(job)
+            finally:
+                if store is not None:
+                    store.close()
+
+    def confirm_checkpoint(self, job):
+        """Let the user solve a checkpoint manually before scraping continues."""
+        messagebox.showinfo("Manual Login Required",
+            "A checkpoint is required. Please log in manually and solve any CAPTCHA. Afterward, click OK to resume scraping.")
+        return True
 
     def handle_exit(self, signum, frame):
         """Handle exit signals to clean up resources."""
         self.update_output("Exiting gracefully...")
+        if self.engine:
+            self.engine.stop()
         sys.exit(0)
 
 # Main function to run the app
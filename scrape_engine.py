@@ -0,0 +1,866 @@
+"""Headless scraping engine shared by the GUI and the batch runner.
+
+Run many targets from a job file with::
+
+    python scrape_engine.py jobs.json --username USER --workers 4
+
+where ``jobs.json`` looks like::
+
+    {
+        "defaults": {"start_date": "2024-01-01", "end_date": "2024-02-01"},
+        "jobs": [
+            {"target": "profile_a"},
+            {"target": "profile_b", "start_date": "2023-06-01", "scrape_comments": true}
+        ]
+    }
+"""
+import argparse
+import getpass
+import json
+import logging
+import os
+import pickle
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import instaloader
+
+from result_store import ResultStore
+
+
+class JsonLinesWriter:
+    """Append-only writer that stores one post record per line.
+
+    Every record is serialized exactly once. The file is fsynced every
+    ``fsync_every`` records, and :meth:`finalize` turns the records into the
+    usual ``{"profile": ..., "posts": [...]}`` document in one streaming pass.
+    """
+
+    def __init__(self, path, fsync_every=25):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.records_written = 0
+        self._unsynced = 0
+        self._file = open(path, "ab")
+        self.offset = self._file.tell()  # Bytes in the file, including not yet synced records
+
+    def append(self, record):
+        """Write a single record as one JSON line and return the offset it starts at."""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self.offset
+        self._file.write(line)
+        self.offset += len(line)
+        self.records_written += 1
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.sync()
+        return offset
+
+    def sync(self):
+        """Flush buffered records and fsync them to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def truncate(self, offset=0):
+        """Discard every record stored after ``offset``."""
+        self._file.flush()
+        self._file.truncate(offset)
+        self.offset = offset
+        self.records_written = 0
+        self._unsynced = 0
+
+    def close(self):
+        """Sync and close the underlying file."""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def finalize(self, target_path, profile, records):
+        """Write ``target_path`` as a JSON document of ``profile`` and the given records."""
+        self.close()
+        temp_path = target_path + ".temp"
+        with open(temp_path, "w", encoding="utf-8") as target:
+            target.write('{\n    "profile": ')
+            target.write(json.dumps(profile, ensure_ascii=False, indent=4).replace("\n", "\n    "))
+            target.write(',\n    "posts": [')
+            first = True
+            for record in records:
+                record = json.dumps(record, ensure_ascii=False, indent=4)
+                target.write(("\n        " if first else ",\n        ") + record.replace("\n", "\n        "))
+                first = False
+            target.write("\n    ]\n}" if not first else "]\n}")
+        os.replace(temp_path, target_path)
+
+
+class ShortcodeIndex:
+    """Index of the latest stored record of every shortcode in a JSON Lines file.
+
+    Maps each shortcode to ``[offset, date]`` of its latest record and is saved
+    as ``{target}.index.json`` together with the size of the records file it
+    covers. If the records file has grown since, only the new tail is scanned;
+    if it has shrunk, the index is rebuilt.
+    """
+
+    def __init__(self, path, records_path):
+        self.path = path
+        self.records_path = records_path
+        self.entries = {}
+        self.size = 0
+
+    def load(self):
+        """Load the index and bring it up to date with the records file."""
+        self.entries, self.size = {}, 0
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as index_file:
+                    data = json.load(index_file)
+                self.entries, self.size = data["entries"], data["size"]
+            except (IOError, ValueError, KeyError):
+                self.entries, self.size = {}, 0
+        records_size = os.path.getsize(self.records_path) if os.path.exists(self.records_path) else 0
+        if self.size > records_size:
+            self.entries, self.size = {}, 0
+        if self.size < records_size:
+            self._scan()
+
+    def _scan(self):
+        offset = self.size
+        with open(self.records_path, "rb") as records_file:
+            records_file.seek(offset)
+            for line in records_file:
+                if not line.endswith(b"\n"):
+                    break  # Partially written last record
+                record = json.loads(line)
+                self.add(record["shortcode"], offset, record["date"])
+                offset += len(line)
+        self.size = offset
+
+    def clear(self):
+        self.entries, self.size = {}, 0
+
+    def add(self, shortcode, offset, date):
+        self.entries[shortcode] = [offset, date]
+
+    def newest_date(self):
+        """Date of the newest stored post, or None if nothing is stored."""
+        if not self.entries:
+            return None
+        return datetime.strptime(max(date for _, date in self.entries.values()), '%Y-%m-%d %H:%M:%S')
+
+    def save(self, size):
+        """Save the index as covering the first ``size`` bytes of the records file."""
+        self.size = size
+        temp_path = self.path + ".temp"
+        with open(temp_path, "w", encoding="utf-8") as index_file:
+            json.dump({"size": self.size, "entries": self.entries}, index_file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def record(self, shortcode):
+        """Return the latest stored record of ``shortcode``."""
+        with open(self.records_path, "rb") as records_file:
+            records_file.seek(self.entries[shortcode][0])
+            return json.loads(records_file.readline())
+
+    def records(self):
+        """Yield the latest record of every shortcode in the order they were written.
+
+        The records file is read once from start to end; records that a later
+        one of the same shortcode replaced are skipped.
+        """
+        offset = 0
+        with open(self.records_path, "rb") as records_file:
+            for line in records_file:
+                if not line.endswith(b"\n"):
+                    break  # Partially written last record
+                record = json.loads(line)
+                entry = self.entries.get(record["shortcode"])
+                if entry is not None and entry[0] == offset:
+                    yield record
+                offset += len(line)
+
+
+class ScrapeJob:
+    """A target profile together with the date window to scrape from it."""
+
+    def __init__(self, target, start_date, end_date, scrape_comments=False, output_dir=".",
+                 state_filename=None, incremental=False, refresh_days=3):
+        self.target = target
+        self.start_date = start_date
+        self.end_date = end_date
+        self.scrape_comments = scrape_comments
+        # Incremental jobs keep the stored posts, fetch newer ones and refresh the last refresh_days days
+        self.incremental = incremental
+        self.refresh_days = refresh_days
+        self.data_filename = os.path.join(output_dir, f"{target}.json")
+        self.records_filename = os.path.join(output_dir, f"{target}.jsonl")
+        self.state_filename = state_filename or os.path.join(output_dir, f"{target}_state.json")
+        self.index = ShortcodeIndex(os.path.join(output_dir, f"{target}.index.json"), self.records_filename)
+        self.stored_newest = None
+        self.base_offset = 0
+        self.profile_data = {"profile": {}}
+        self.posts_scraped = 0
+        self.posts_refreshed = 0
+        self.succeeded = False
+        self.wall_seconds = 0.0
+        self.thread_seconds = 0.0
+        self.waited_seconds = 0.0
+        self.wait_account = None
+
+        # Resume information, see ScrapeEngine.save_checkpoint
+        self.checkpoint = None
+        self.post_iterator = None
+        self.last_post_shortcode = None
+        self.checkpoint_records = 0
+
+    @classmethod
+    def from_dict(cls, data, defaults=None):
+        """Create a job from one entry of a job file, filling gaps from ``defaults``."""
+        merged = dict(defaults or {})
+        merged.update(data)
+        return cls(target=merged["target"],
+                   start_date=merged["start_date"],
+                   end_date=merged.get("end_date") or datetime.now().strftime('%Y-%m-%d'),
+                   scrape_comments=merged.get("scrape_comments", False),
+                   output_dir=merged.get("output_dir", "."),
+                   incremental=merged.get("incremental", False),
+                   refresh_days=merged.get("refresh_days", 3))
+
+
+def load_jobs(path):
+    """Load the jobs listed in a JSON job file."""
+    with open(path, "r", encoding="utf-8") as job_file:
+        data = json.load(job_file)
+    if isinstance(data, list):
+        data = {"jobs": data}
+    defaults = data.get("defaults", {})
+    return [ScrapeJob.from_dict(entry, defaults) for entry in data["jobs"]]
+
+
+class WaitAccount:
+    """Time the threads working on one job ran, and how much of it they spent waiting deliberately.
+
+    A job's worker and its comment workers add to the same account, hence the lock."""
+
+    def __init__(self):
+        self.thread_seconds = 0.0
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, thread_seconds=0.0, waited_seconds=0.0):
+        with self._lock:
+            self.thread_seconds += thread_seconds
+            self.waited_seconds += waited_seconds
+
+
+class PacingScheduler:
+    """Token-bucket pacing shared by every worker of an engine.
+
+    Requests are paced at ``max_requests`` per ``window_seconds`` with bursts of up
+    to ``burst`` requests, so a worker only sleeps when the budget requires it. A
+    429 response halves the rate until a full window passes without another one.
+    Every deliberate wait is added to the :class:`WaitAccount` the calling thread
+    is charging, see :meth:`charge_to`.
+    """
+
+    def __init__(self, max_requests=150, window_seconds=660, burst=10):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.burst = burst
+        self.requests = 0
+        self.responses_429 = 0
+        self._base_rate = max_requests / window_seconds
+        self._rate = self._base_rate
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._last_429 = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _refill(self, now):
+        if self._last_429 is not None and now - self._last_429 >= self.window_seconds:
+            self._rate = self._base_rate
+            self._last_429 = None
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take one request from the budget, sleeping only if it is exhausted."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # Reserve the token right away; a negative balance is the time to wait for it
+            self._tokens -= 1
+            self.requests += 1
+            delay = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            self.sleep(delay)
+
+    def record_429(self):
+        """Slow down after Instagram answered with 429 Too Many Requests."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._rate = max(self._rate / 2, self._base_rate / 8)
+            self._tokens = min(self._tokens, 0.0)
+            self._last_429 = now
+            self.responses_429 += 1
+
+    def sleep(self, secs, stop_event=None):
+        """Wait deliberately, optionally until ``stop_event`` is set, and account for it."""
+        start = time.monotonic()
+        if stop_event is not None:
+            stop_event.wait(secs)
+        else:
+            time.sleep(secs)
+        account = getattr(self._local, "account", None)
+        if account is not None:
+            account.add(waited_seconds=time.monotonic() - start)
+
+    def charge_to(self, account):
+        """Add the calling thread's deliberate waits to ``account`` from now on."""
+        self._local.account = account
+
+
+class PacedRateController(instaloader.RateController):
+    """RateController that paces queries through a shared :class:`PacingScheduler`.
+
+    Its own per-query-type limits still apply, but their sleeps and the 429 handling
+    are routed through the scheduler, so all waiting is accounted in one place."""
+
+    def __init__(self, context, pacer):
+        super().__init__(context)
+        self._pacer = pacer
+
+    def sleep(self, secs):
+        self._pacer.sleep(secs)
+
+    def wait_before_query(self, query_type):
+        self._pacer.acquire()
+        super().wait_before_query(query_type)
+
+    def handle_429(self, query_type):
+        self._pacer.record_429()
+        super().handle_429(query_type)
+
+
+def create_loader(pacer):
+    """Create an Instaloader whose requests are paced by ``pacer``."""
+    # The pacer replaces Instaloader's own random sleep before every request
+    return instaloader.Instaloader(sleep=False, rate_controller=lambda ctx: PacedRateController(ctx, pacer))
+
+
+class SessionPool:
+    """Logged-in Instaloaders keyed by account, backed by saved session files.
+
+    A new loader loads the account's session file, which is validated with a
+    single ``test_login()`` the first time it is used in this process. Only if
+    there is no valid session does the pool log in with the password, and the
+    fresh session is saved right away for the other workers and later runs.
+    Loaders that are checked in are handed out again without any request.
+    """
+
+    def __init__(self, loader_factory, session_dir=None, log=None):
+        self.loader_factory = loader_factory
+        self.session_dir = session_dir
+        self.log = log or (lambda message, overwrite=False: logging.info(message))
+        self._idle = {}
+        self._validated = set()
+        self._lock = threading.Lock()
+        self._account_locks = {}
+
+    def session_filename(self, username):
+        """Session file of the account, or None for Instaloader's default location."""
+        if self.session_dir is None:
+            return None
+        return os.path.join(self.session_dir, f"session-{username}")
+
+    def checkout(self, username, password):
+        """Return a loader logged in as ``username``; ``password`` may be a callable asked only if needed."""
+        with self._lock:
+            if self._idle.get(username):
+                return self._idle[username].pop()
+            account_lock = self._account_locks.setdefault(username, threading.Lock())
+        # Loaders of one account are set up one at a time, so that at most one of them logs in
+        with account_lock:
+            loader = self.loader_factory()
+            if self._load_session(loader, username):
+                return loader
+            self.log("Logging in...")
+            loader.login(username, password() if callable(password) else password)
+            self.log("Login successful")
+            loader.save_session_to_file(self.session_filename(username))
+            self._validated.add(username)
+            return loader
+
+    def _load_session(self, loader, username):
+        try:
+            loader.load_session_from_file(username, self.session_filename(username))
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            return False
+        if username in self._validated:
+            return True
+        if loader.test_login() == username:
+            self._validated.add(username)
+            self.log(f"Reusing saved session of {username}")
+            return True
+        self.log(f"Saved session of {username} is no longer valid")
+        return False
+
+    def checkin(self, loader):
+        """Hand a loader back for reuse."""
+        with self._lock:
+            self._idle.setdefault(loader.context.username, []).append(loader)
+
+    def invalidate(self, username, loader):
+        """Discard ``loader`` and revalidate the account's session before its next use."""
+        with self._lock:
+            self._validated.discard(username)
+            stale = self._idle.pop(username, [])
+        for other in stale + [loader]:
+            other.close()
+
+
+class ScrapeEngine:
+    """Scrapes jobs through a bounded pool of workers.
+
+    Each worker thread checks its own :class:`instaloader.Instaloader` out of a
+    :class:`SessionPool`, while all of them are paced by the same :class:`PacingScheduler`. Progress is reported
+    through ``log(message, overwrite=False)``, and ``on_checkpoint(job)`` decides
+    whether a job is retried after Instagram asked for a checkpoint.
+    """
+
+    def __init__(self, username, password, workers=1, pacer=None, sessions=None, log=None, on_checkpoint=None,
+                 fsync_every=25, possibly_pinned=3, comment_workers=4, store=None):
+        self.username = username
+        self.password = password  # The password, or a callable returning it when a login is needed
+        self.workers = workers
+        self.pacer = pacer or PacingScheduler()
+        self.log = log or (lambda message, overwrite=False: logging.info(message))
+        self.sessions = sessions or SessionPool(lambda: create_loader(self.pacer), log=self.log)
+        self.on_checkpoint = on_checkpoint or (lambda job: False)
+        self.fsync_every = fsync_every  # Records between fsyncs of the JSON Lines file
+        self.possibly_pinned = possibly_pinned  # Leading posts that may be pinned and thus out of date order
+        self.comment_workers = comment_workers  # Threads fetching comments per job
+        self.max_in_flight = 2 * comment_workers  # Listed posts that may wait for their comments
+        self.store = store  # Optional ResultStore receiving every record as well
+        self.stop_event = threading.Event()
+        self._local = threading.local()
+
+    def stop(self):
+        """Ask all workers to stop after their current post."""
+        self.stop_event.set()
+
+    def run(self, jobs):
+        """Scrape all jobs through the worker pool and return them once finished."""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scrape-worker") as executor:
+            list(executor.map(self.run_job, jobs))
+        return jobs
+
+    def get_loader(self):
+        """Return the calling worker's Instaloader, checking one out of the session pool on first use."""
+        loader = getattr(self._local, "loader", None)
+        if loader is None:
+            loader = self.sessions.checkout(self.username, self.password)
+            self._local.loader = loader
+        return loader
+
+    def release_loader(self):
+        """Hand the calling worker's Instaloader back to the session pool."""
+        loader = getattr(self._local, "loader", None)
+        if loader is not None:
+            self.sessions.checkin(loader)
+            self._local.loader = None
+
+    def drop_loader(self):
+        """Discard the calling worker's Instaloader so that the next attempt revalidates its session."""
+        loader = getattr(self._local, "loader", None)
+        if loader is not None:
+            self.sessions.invalidate(self.username, loader)
+            self._local.loader = None
+
+    def run_job(self, job):
+        """Scrape a single job, retrying on Instaloader errors and resuming from its checkpoint."""
+        self.log(f"Starting scraping process for {job.target}...")
+        job.wait_account = WaitAccount()
+        self.pacer.charge_to(job.wait_account)
+        started = time.monotonic()
+        job.checkpoint = self.load_checkpoint(job)
+        if job.checkpoint is not None:
+            # Drop records written after the checkpoint, they will be fetched again
+            os.truncate(job.records_filename, job.checkpoint["records_offset"])
+            job.index.load()
+            job.posts_scraped = job.checkpoint["records_written"]
+            job.base_offset = job.checkpoint.get("base_offset", 0)
+            job.stored_newest = (datetime.strptime(job.checkpoint["stored_newest"], '%Y-%m-%d %H:%M:%S')
+                                 if job.checkpoint.get("stored_newest") else None)
+            self.log(f"Resuming {job.target} after post {job.checkpoint['last_post_shortcode']} "
+                     f"with {job.posts_scraped} posts already stored")
+        elif job.incremental and os.path.exists(job.records_filename):
+            job.index.load()
+            os.truncate(job.records_filename, job.index.size)  # Drop a partially written last record
+            job.base_offset = job.index.size
+            job.stored_newest = job.index.newest_date()
+            self.log(f"Updating {job.target}: {len(job.index.entries)} posts stored, newest from {job.stored_newest}")
+        else:
+            open(job.records_filename, "w", encoding="utf-8").close()
+            job.index.clear()
+        writer = JsonLinesWriter(job.records_filename, self.fsync_every)
+        writer.records_written = job.posts_scraped
+        job.checkpoint_records = job.posts_scraped
+        try:
+            attempt = 0
+            while attempt < 5 and not self.stop_event.is_set():  # Retry up to 5 times
+                try:
+                    if not self.scrape_posts(job, self.get_loader(), writer):
+                        self.save_checkpoint(job, writer)
+                        self.log(f"Stopped scraping of {job.target}, saved checkpoint to {job.state_filename}")
+                        break
+                    self.log(f"Scraped {job.posts_scraped} posts from {job.target}" +
+                             (f", {job.posts_refreshed} of them refreshed" if job.incremental else ""))
+                    writer.finalize(job.data_filename, job.profile_data["profile"], job.index.records())
+                    job.index.save(writer.offset)
+                    self.sync_store(job)
+                    self.log(f"Data saved to {job.data_filename}")
+                    if os.path.exists(job.state_filename):
+                        os.unlink(job.state_filename)
+                    job.succeeded = True
+                    break  # Exit retry loop on success
+
+                except instaloader.exceptions.InstaloaderException as e:
+                    self.save_checkpoint(job, writer)
+                    if "checkpoint_required" in str(e).lower():
+                        self.log("Checkpoint required. Please log in manually and solve the CAPTCHA.")
+                        self.drop_loader()
+                        if not self.on_checkpoint(job):
+                            break
+                        self.log(f"Resuming scraping of {job.target}...")
+                    else:
+                        self.log(f"Instaloader Exception encountered: {e}")
+                        attempt += 1
+                        self.exponential_backoff(attempt)  # Wait before retrying
+                except Exception as e:
+                    self.save_checkpoint(job, writer)
+                    self.log(f"Unexpected error: {e}")
+                    break
+        finally:
+            writer.close()
+            self.release_loader()
+        job.wall_seconds = time.monotonic() - started
+        job.wait_account.add(thread_seconds=job.wall_seconds)
+        job.thread_seconds = job.wait_account.thread_seconds
+        job.waited_seconds = job.wait_account.waited_seconds
+        self.log(f"{job.target}: {job.wall_seconds:.1f}s in total; of {job.thread_seconds:.1f}s its threads ran, "
+                 f"{job.waited_seconds:.1f}s went to waiting deliberately and "
+                 f"{job.thread_seconds - job.waited_seconds:.1f}s to I/O and processing")
+        return job
+
+    def scrape_posts(self, job, loader, writer):
+        """Collect the profile and every post within the job's date window.
+
+        Returns False if the engine was stopped before the window was exhausted."""
+        # Parse the date window once
+        window_start = datetime.strptime(job.start_date, '%Y-%m-%d')
+        window_end = datetime.strptime(job.end_date, '%Y-%m-%d')
+        refresh_from = None
+        if job.incremental and job.stored_newest is not None:
+            # Only posts newer than the stored ones, plus those within the refresh horizon
+            refresh_from = max(window_start, datetime.now().replace(microsecond=0) - timedelta(days=job.refresh_days))
+            window_start = max(window_start, min(job.stored_newest, refresh_from))
+
+        post_iterator = self.thaw_posts(job, loader, writer) if job.checkpoint is not None else None
+        if post_iterator is None:
+            # Load target profile data
+            profile = instaloader.Profile.from_username(loader.context, job.target)
+            job.profile_data["profile"] = {
+                "username": profile.username,
+                "fullname": profile.full_name,
+                "bio": profile.biography,
+                "followers": profile.followers,
+                "following": profile.followees,
+                "posts": profile.mediacount
+            }
+            post_iterator = profile.get_posts()
+        job.post_iterator = post_iterator
+
+        # Scrape posts. They arrive newest-first, so the iteration stops at the first post older
+        # than the window, except for the first few posts, which might be pinned.
+        # Listing, comment fetching and writing form a pipeline: comments are fetched by a pool of
+        # workers while the listing continues, and records are written in listing order. Skipped
+        # posts pass through the pipeline as None to keep last_post_shortcode in order.
+        resumed_after = job.last_post_shortcode
+        start_index = post_iterator.total_index + 1
+        pending = deque()
+        # Comment workers charge the job's account and fetch through loaders of their own
+        comment_loaders = []
+        comment_pool = (ThreadPoolExecutor(max_workers=self.comment_workers, thread_name_prefix="comment-worker",
+                                           initializer=self.pacer.charge_to, initargs=(job.wait_account,))
+                        if job.scrape_comments else None)
+        try:
+            for number, post in enumerate(post_iterator, start=start_index):
+                if self.stop_event.is_set():
+                    return False
+                if number == start_index and post.shortcode == resumed_after:
+                    # A thawed iterator yields the last post handled before freezing once more
+                    continue
+                if post.date < window_start:
+                    if number <= self.possibly_pinned:
+                        pending.append((post.shortcode, None))
+                        continue
+                    self.report_skipped_pages(window_start, job, post_iterator)
+                    break
+                if post.date > window_end:
+                    pending.append((post.shortcode, None))
+                    continue
+                stored = None
+                if post.shortcode in job.index.entries:
+                    if (refresh_from is None or post.date < refresh_from or
+                            job.index.entries[post.shortcode][0] >= job.base_offset):
+                        pending.append((post.shortcode, None))  # Already stored, or refreshed by this run
+                        continue
+                    stored = job.index.record(post.shortcode)
+                    job.posts_refreshed += 1
+
+                post_date = post.date.strftime('%Y-%m-%d %H:%M:%S')
+                try:
+                    if stored is not None:
+                        # Only likes and caption change; the stored comments stay unless fetched again below
+                        post_details = dict(stored, caption=post.caption, likes=post.likes)
+                    else:
+                        post_details = {
+                            "shortcode": post.shortcode,
+                            "date": post_date,
+                            "caption": post.caption,
+                            "likes": post.likes,
+                            "comments": 0
+                        }
+                except instaloader.exceptions.BadResponseException as e:
+                    self.log(f"Bad Response Exception for post {post_date}: {e}")
+                    self.handle_bad_request_error()
+                    continue  # Skip to the next post
+
+                self.log(f"Scraping post {post_date}")
+
+                # Scrape comments if enabled
+                if comment_pool is not None:
+                    record = comment_pool.submit(self.fetch_comments, job, post, post_details, post_date,
+                                                 comment_loaders)
+                else:
+                    record = Future()
+                    record.set_result(post_details)
+                pending.append((post.shortcode, record))
+
+                # Write what is ready, but never keep more than max_in_flight posts in the pipeline
+                self.write_pending(job, writer, pending, self.max_in_flight)
+                if writer.records_written - job.checkpoint_records >= self.fsync_every:
+                    self.write_pending(job, writer, pending)
+                    self.save_checkpoint(job, writer)
+            return True
+        finally:
+            self.write_pending(job, writer, pending)
+            if comment_pool is not None:
+                comment_pool.shutdown()
+                for comment_loader in comment_loaders:
+                    self.sessions.checkin(comment_loader)
+
+    def fetch_comments(self, job, post, post_details, post_date, comment_loaders):
+        """Add the comments of a post to its record; runs on a comment worker.
+
+        Instaloader contexts are not thread-safe, so the worker fetches through a
+        loader of its own, which is appended to ``comment_loaders`` to be checked
+        back in once the job's comments are fetched."""
+        started = time.monotonic()
+        try:
+            loader = getattr(self._local, "loader", None)
+            if loader is None:
+                loader = self.get_loader()
+                comment_loaders.append(loader)
+            # The post as seen through the worker's context; the listing does not touch it any more
+            post = instaloader.Post(loader.context, post._node)  # pylint:disable=protected-access
+            comments = []
+            for comment in post.get_comments():
+                comments.append({
+                    "comment": comment.text,
+                    "commenter": comment.owner.username
+                })
+            post_details["comments"] = comments
+            self.log(f"Scraped comments for post {post_date}")
+        except Exception as e:
+            self.log(f"Error scraping comments for post {post_date}: {e}")
+        finally:
+            job.wait_account.add(thread_seconds=time.monotonic() - started)
+        return post_details
+
+    def write_pending(self, job, writer, pending, max_pending=0):
+        """Write finished records in listing order until at most ``max_pending`` posts are in flight."""
+        while pending and (len(pending) > max_pending or pending[0][1] is None or pending[0][1].done()):
+            shortcode, record = pending.popleft()
+            if record is not None:
+                record = record.result()
+                job.index.add(shortcode, writer.append(record), record["date"])
+                if self.store is not None:
+                    self.store.add_post(job.target, record)
+                job.posts_scraped += 1
+            job.last_post_shortcode = shortcode
+
+    def thaw_posts(self, job, loader, writer):
+        """Rebuild the timeline iterator from the job's checkpoint without fetching any page.
+
+        Returns None if the checkpoint cannot be resumed, in which case the job starts over."""
+        frozen = instaloader.FrozenNodeIterator(**job.checkpoint["iterator"])
+        context = loader.context
+        try:
+            if datetime.fromtimestamp(frozen.best_before) < datetime.now():
+                raise instaloader.exceptions.InvalidArgumentException("\"Best before\" date exceeded.")
+            # Same construction as Profile.get_posts(), but starting from the frozen page
+            post_iterator = instaloader.NodeIterator(
+                context=context,
+                query_hash=frozen.query_hash,
+                edge_extractor=lambda d: d['data']['xdt_api__v1__feed__user_timeline_graphql_connection'],
+                node_wrapper=lambda n: instaloader.Post.from_iphone_struct(context, n),
+                query_variables=frozen.query_variables,
+                query_referer=frozen.query_referer,
+                first_data=frozen.remaining_data,
+                is_first=instaloader.Profile._make_is_newest_checker(),  # pylint:disable=protected-access
+                doc_id=frozen.doc_id,
+            )
+            post_iterator.thaw(frozen)
+        except instaloader.exceptions.InvalidArgumentException as e:
+            self.log(f"Not resuming {job.target} from checkpoint: {e}")
+            job.checkpoint = None
+            job.last_post_shortcode = None
+            job.posts_scraped = 0
+            job.checkpoint_records = 0
+            writer.truncate(job.base_offset)
+            job.index.load()
+            return None
+        job.profile_data["profile"] = job.checkpoint["profile"]
+        job.last_post_shortcode = job.checkpoint["last_post_shortcode"]
+        return post_iterator
+
+    def save_checkpoint(self, job, writer):
+        """Save the frozen timeline cursor and the synced record offset to the job's state file."""
+        if job.post_iterator is None:
+            return
+        writer.sync()
+        job.checkpoint = {
+            "target": job.target,
+            "start_date": job.start_date,
+            "end_date": job.end_date,
+            "last_post_shortcode": job.last_post_shortcode,
+            "records_written": writer.records_written,
+            "records_offset": writer.offset,
+            "base_offset": job.base_offset,
+            "stored_newest": job.stored_newest.strftime('%Y-%m-%d %H:%M:%S') if job.stored_newest else None,
+            "profile": job.profile_data["profile"],
+            "iterator": job.post_iterator.freeze()._asdict(),
+        }
+        job.checkpoint_records = writer.records_written
+        job.index.save(writer.offset)
+        self.sync_store(job)
+        temp_filename = job.state_filename + ".temp"
+        with open(temp_filename, "w", encoding="utf-8") as state_file:
+            json.dump(job.checkpoint, state_file, ensure_ascii=False)
+        os.replace(temp_filename, job.state_filename)
+
+    def sync_store(self, job):
+        """Commit the job's profile and queued records to the result store, if any."""
+        if self.store is None:
+            return
+        if job.profile_data["profile"]:
+            self.store.save_profile(job.profile_data["profile"])
+        self.store.flush()
+
+    def load_checkpoint(self, job):
+        """Return the job's saved checkpoint, or None if there is no matching one."""
+        if not os.path.exists(job.state_filename):
+            return None
+        try:
+            with open(job.state_filename, "r", encoding="utf-8") as state_file:
+                checkpoint = json.load(state_file)
+        except (IOError, ValueError) as e:
+            self.log(f"Ignoring unreadable checkpoint {job.state_filename}: {e}")
+            return None
+        if (checkpoint.get("target") != job.target or checkpoint.get("start_date") != job.start_date or
+                checkpoint.get("end_date") != job.end_date or not checkpoint.get("iterator") or
+                not os.path.exists(job.records_filename) or
+                os.path.getsize(job.records_filename) < checkpoint["records_offset"]):
+            return None
+        return checkpoint
+
+    def report_skipped_pages(self, window_start, job, post_iterator):
+        """Report how many timeline pages were not fetched thanks to stopping early."""
+        page_length = post_iterator.page_length()
+        total_pages = -(-job.profile_data["profile"]["posts"] // page_length)
+        fetched_pages = -(-post_iterator.total_index // page_length)
+        skipped_pages = max(total_pages - fetched_pages, 0)
+        self.log(f"Reached posts older than {window_start}; "
+                 f"skipped {skipped_pages} of {total_pages} pages")
+
+    def countdown_timer(self, delay_seconds):
+        """Report a countdown while waiting."""
+        for remaining in range(delay_seconds, 0, -1):
+            if self.stop_event.is_set():
+                return
+            self.log(f"Resuming in {remaining} seconds...", overwrite=True)
+            self.pacer.sleep(1, self.stop_event)
+        self.log("Resuming...", overwrite=True)
+
+    def handle_bad_request_error(self):
+        """Handle Bad Response errors by waiting before the next post."""
+        self.log("Encountered a Bad Response error. Waiting before retrying...")
+        delay_seconds = random.randint(60, 120)  # Wait between 1 and 2 minutes
+        self.countdown_timer(delay_seconds)
+        self.log("Resuming scraping...")
+
+    def exponential_backoff(self, attempt):
+        """Wait with exponential backoff before the next attempt."""
+        base_delay = 60  # Base delay in seconds
+        max_delay = 600  # Maximum delay in seconds
+        delay = min(base_delay * (1.5 ** attempt), max_delay)
+        self.log(f"Waiting for {delay} seconds before retrying...")
+        self.pacer.sleep(delay, self.stop_event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape Instagram profiles listed in a job file.")
+    parser.add_argument("job_file", help="JSON file listing the targets and date windows to scrape")
+    parser.add_argument("--username", required=True, help="Instagram username to log in with")
+    parser.add_argument("--session-dir", help="Directory for saved sessions, default is Instaloader's location")
+    parser.add_argument("--workers", type=int, default=2, help="Number of profiles scraped concurrently")
+    parser.add_argument("--max-requests", type=int, default=150,
+                        help="Requests all workers may issue together within --window seconds")
+    parser.add_argument("--window", type=float, default=660, help="Length of the rate budget window in seconds")
+    parser.add_argument("--burst", type=int, default=10, help="Requests that may be issued without pacing")
+    parser.add_argument("--db", help="SQLite database that also receives every profile, post and comment")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(threadName)s - %(message)s')
+    # Only asked for if there is no valid saved session
+    def password():
+        return os.environ.get("INSTAGRAM_PASSWORD") or getpass.getpass("Instagram Password: ")
+
+    pacer = PacingScheduler(args.max_requests, args.window, args.burst)
+    sessions = SessionPool(lambda: create_loader(pacer), args.session_dir)
+    store = ResultStore(args.db) if args.db else None
+    engine = ScrapeEngine(args.username, password, workers=args.workers, pacer=pacer, sessions=sessions, store=store)
+    try:
+        jobs = engine.run(load_jobs(args.job_file))
+    finally:
+        if store is not None:
+            store.close()
+    failed = [job.target for job in jobs if not job.succeeded]
+    logging.info(f"Finished {len(jobs) - len(failed)} of {len(jobs)} jobs with {engine.pacer.requests} requests "
+                 f"and {engine.pacer.responses_429} 429 responses; "
+                 f"{sum(job.waited_seconds for job in jobs):.1f}s of "
+                 f"{sum(job.thread_seconds for job in jobs):.1f}s thread time went to deliberate waiting")
+    if failed:
+        logging.error(f"Failed jobs: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,226 @@
+"""Tests of AsyncInstaloaderContext and the async iterators against a local stand-in for Instagram.
+
+Run with ``python -m unittest discover test``. The AiohttpBackend tests are skipped if aiohttp is not installed.
+"""
+
+import asyncio
+import http.server
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.parse
+
+import instaloader
+from instaloader import (AiohttpBackend, AsyncHTTPBackend, AsyncInstaloaderContext, AsyncNodeIterator,
+                         ThreadedRequestsBackend)
+from instaloader.sectioniterator import AsyncSectionIterator
+
+PAGES = 3
+PAGE_LENGTH = 4
+MEDIA = {"{}.jpg".format(number): os.urandom(50_000 + number) for number in range(20)}
+VIDEO = os.urandom(1_000_000)
+
+
+def _page(cursor):
+    page = int(cursor) if cursor else 0
+    return {"edges": [{"node": {"id": page * PAGE_LENGTH + index}} for index in range(PAGE_LENGTH)],
+            "page_info": {"has_next_page": page + 1 < PAGES, "end_cursor": str(page + 1)}}
+
+
+class _StandIn(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    cut_video = 0  # Number of video responses that break off halfway
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(status, json.dumps(data).encode())
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        if url.path == "/graphql/query":
+            after = json.loads(params["variables"]).get("after")
+            self._send_json({"status": "ok", "data": {"user": {"edge_media": _page(after)}}})
+        elif url.path == "/api/v1/sections/":
+            page = int(params.get("max_id", 0))
+            medias = [{"media": {"id": page * PAGE_LENGTH + index}} for index in range(PAGE_LENGTH)]
+            self._send_json({"status": "ok", "sections": [{"layout_content": {"medias": medias[:2]}},
+                                                          {"layout_content": {"medias": medias[2:]}}],
+                             "more_available": page + 1 < PAGES, "next_max_id": str(page + 1)})
+        elif url.path.startswith("/media/") and url.path[len("/media/"):] in MEDIA:
+            self._send(200, MEDIA[url.path[len("/media/"):]], "image/jpeg")
+        elif url.path == "/video.mp4":
+            self._send_video()
+        else:
+            self._send_json({"status": "fail", "message": "not found"}, 404)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        params = dict(urllib.parse.parse_qsl(body.decode()))
+        after = json.loads(params["variables"]).get("after")
+        self._send_json({"status": "ok", "data": {"user": {"edge_media": _page(after)}}})
+
+    def _send_video(self):
+        start = 0
+        headers = {"Accept-Ranges": "bytes", "ETag": '"video"'}
+        if "Range" in self.headers and self.headers.get("If-Range") == '"video"':
+            start = int(self.headers["Range"][len("bytes="):-1])
+            headers["Content-Range"] = "bytes {}-{}/{}".format(start, len(VIDEO) - 1, len(VIDEO))
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(VIDEO) - start))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if _StandIn.cut_video:
+            _StandIn.cut_video -= 1
+            self.wfile.write(VIDEO[start:len(VIDEO) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(VIDEO[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+def _local_backend(backend_class, base_url):
+    """Backend of the given class that sends requests to Instagram to the stand-in server instead"""
+
+    class LocalBackend(backend_class):
+        async def request(self, method, url, **kwargs):
+            for host in ("https://www.instagram.com", "https://i.instagram.com"):
+                if url.startswith(host):
+                    url = base_url + url[len(host):]
+            return await super().request(method, url, **kwargs)
+
+    return LocalBackend
+
+
+class TestAsyncInstaloaderContext(unittest.TestCase):
+    backend_class = ThreadedRequestsBackend
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = "http://127.0.0.1:{}".format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.context = instaloader.InstaloaderContext(sleep=False, quiet=True, max_connection_attempts=2)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.context.close()
+        self.directory.cleanup()
+
+    def run_async(self, function):
+        async def run():
+            async with AsyncInstaloaderContext(self.context,
+                                               _local_backend(self.backend_class, self.base_url)) as context:
+                return await function(context)
+        return asyncio.run(run())
+
+    @staticmethod
+    def _nodes(context, **kwargs):
+        return AsyncNodeIterator(context, kwargs.pop("query_hash", None),
+                                 lambda d: d["data"]["user"]["edge_media"], lambda node: node["id"], {"id": "1"},
+                                 **kwargs)
+
+    def test_graphql_node_iterator(self):
+        async def iterate(context):
+            return [node async for node in self._nodes(context, query_hash="hash")]
+        self.assertEqual(self.run_async(iterate), list(range(PAGES * PAGE_LENGTH)))
+
+    def test_doc_id_node_iterator_freeze_thaw(self):
+        async def iterate(context):
+            nodes = self._nodes(context, doc_id="1")
+            first = [await nodes.__anext__() for _ in range(PAGE_LENGTH + 1)]
+            frozen = nodes.freeze()
+            thawed = self._nodes(context, doc_id="1")
+            thawed.thaw(frozen)
+            return first, [node async for node in thawed]
+        first, rest = self.run_async(iterate)
+        # like the synchronous NodeIterator, the thawed iterator yields the last item returned before freezing again
+        self.assertEqual(first + rest[1:], list(range(PAGES * PAGE_LENGTH)))
+        self.assertEqual(rest[0], first[-1])
+
+    def test_node_iterator_needs_async_for(self):
+        async def iterate(context):
+            with self.assertRaises(TypeError):
+                list(self._nodes(context, query_hash="hash"))
+        self.run_async(iterate)
+
+    def test_section_iterator(self):
+        async def iterate(context):
+            sections = AsyncSectionIterator(context, lambda d: d, lambda media: media["id"], "api/v1/sections/")
+            return [media async for media in sections]
+        self.assertEqual(self.run_async(iterate), list(range(PAGES * PAGE_LENGTH)))
+
+    def test_not_found(self):
+        async def query(context):
+            with self.assertRaises(instaloader.QueryReturnedNotFoundException):
+                await context.get_json("missing/", {})
+            with self.assertRaises(instaloader.QueryReturnedNotFoundException):
+                await context.get_raw(self.base_url + "/media/missing.jpg")
+        self.run_async(query)
+
+    def test_concurrent_downloads(self):
+        async def download(context):
+            await asyncio.gather(*(context.get_and_write_raw(self.base_url + "/media/" + name,
+                                                             os.path.join(self.directory.name, name))
+                                   for name in MEDIA))
+        self.run_async(download)
+        for name, content in MEDIA.items():
+            with open(os.path.join(self.directory.name, name), "rb") as file:
+                self.assertEqual(file.read(), content)
+
+    def test_resumed_download(self):
+        filename = os.path.join(self.directory.name, "video.mp4")
+
+        async def download(context):
+            with self.assertRaises(instaloader.ConnectionException):
+                await context.get_and_write_raw(self.base_url + "/video.mp4", filename)
+            await context.get_and_write_raw(self.base_url + "/video.mp4", filename)
+        _StandIn.cut_video = 1
+        self.run_async(download)
+        with open(filename, "rb") as file:
+            self.assertEqual(file.read(), VIDEO)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ["video.mp4"])
+        self.assertEqual(self.context.media_connection_stats()["resumed"], 1)
+
+    def test_backend_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AsyncHTTPBackend()  # pylint:disable=abstract-class-instantiated
+
+
+class TestAsyncInstaloaderContextAiohttp(TestAsyncInstaloaderContext):
+    backend_class = AiohttpBackend
+
+    @classmethod
+    def setUpClass(cls):
+        if importlib.util.find_spec("aiohttp") is None:
+            raise unittest.SkipTest("aiohttp is not installed")
+        super().setUpClass()
+
+
+if __name__ == "__main__":
+    unittest.main()
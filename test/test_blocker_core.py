@@ -0,0 +1,67 @@
+"""Tests of the hosts file blocking in blocker_core against a temporary hosts file.
+
+Run with ``python -m unittest discover test``.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blocker_core import BlockingManager, BlockJournal, HostsFileManager  # noqa: E402
+
+
+class TestBlockingManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.hosts_path = os.path.join(self.directory.name, "hosts")
+        with open(self.hosts_path, "w") as hosts:
+            hosts.write("127.0.0.1 localhost\n")
+        self.manager = BlockingManager(HostsFileManager(self.hosts_path), write_delay=0.05,
+                                       journal=BlockJournal(os.path.join(self.directory.name, "journal.jsonl")),
+                                       watch_interval=60)
+
+    def tearDown(self):
+        self.manager.watcher.stop()
+        self.manager.scheduler.stop()
+        self.directory.cleanup()
+
+    def test_flush_after_empty_unblock(self):
+        self.manager.unblock([])
+        self.manager.flush(timeout=1)
+        self.manager.block(["example.com"], 60)
+        self.manager.flush(timeout=1)
+        self.assertIn("example.com", self.manager.hosts_manager.blocked)
+
+    def test_flush_after_empty_bulk(self):
+        self.manager.bulk([{"op": "unblock", "websites": []}])
+        self.manager.flush(timeout=1)
+        self.manager.bulk([{"op": "block", "websites": ["example.com"], "duration": 60}])
+        self.manager.flush(timeout=1)
+        self.assertIn("example.com", self.manager.hosts_manager.blocked)
+
+    def test_stale_expiry_keeps_new_block(self):
+        first = self.manager.block(["example.com"], 60)["expires_at"]
+        # Blocked again after the scheduler took the first expiry, before it was handled
+        second = self.manager.block(["example.com"], 120)["expires_at"]
+        self.manager.expire_blocks([("example.com", first)])
+        self.manager.flush(timeout=1)
+        self.assertEqual(self.manager.list_blocks(), {"example.com": second})
+        self.assertIn("example.com", self.manager.hosts_manager.blocked)
+
+    def test_block_expires(self):
+        self.manager.block(["example.com"], 0.1)
+        self.manager.scheduler.coalesce_seconds = 0
+        deadline = time.time() + 5
+        while self.manager.list_blocks() and time.time() < deadline:
+            time.sleep(0.05)
+        self.manager.flush(timeout=1)
+        self.assertEqual(self.manager.list_blocks(), {})
+        self.assertNotIn("example.com", self.manager.hosts_manager.blocked)
+
+
+if __name__ == "__main__":
+    unittest.main()